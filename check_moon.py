@@ -1,45 +1,27 @@
 #!/usr/bin/env python3
-import subprocess
-import os
+import shutil
 import sys
 
-# 设置 PATH 环境变量
-os.environ['PATH'] = os.path.expanduser('~/.moon/bin:') + os.environ.get('PATH', '')
+from harness import pipeline
 
-print("=== Checking if moon is installed ===")
-result = subprocess.run(['which', 'moon'], capture_output=True, text=True)
-print(result.stdout)
-
-if result.returncode != 0:
-    print("Moon not found, installing...")
-    install_result = subprocess.run([
-        'curl', '-fsSL',
-        'https://cli.moonbitlang.com/install/unix.sh'
-    ], capture_output=True, text=True)
-    print(install_result.stdout)
-    print(install_result.stderr)
-
-    # 执行安装脚本
-    if install_result.returncode == 0:
-        install_script = install_result.stdout
-        exec_result = subprocess.run(install_script, shell=True, capture_output=True, text=True)
-        print(exec_result.stdout)
-        print(exec_result.stderr)
+print("=== Checking if moon is installed, installing it if missing ===")
+outcome = pipeline.run(pipeline.run_task('/home/engine/project', guard=False))
+if outcome is None:
+    print("Moon installation failed")
+    sys.exit(2)
+print(outcome.moon)
 
 print("\n=== Moon version ===")
-result = subprocess.run(['moon', '--version'], capture_output=True, text=True)
-print(result.stdout)
-print(result.stderr)
+print(outcome.version)
 
 print("\n=== Running moon test ===")
-result = subprocess.run(['moon', 'test'], cwd='/home/engine/project', capture_output=True, text=True)
-print(result.stdout)
-print(result.stderr)
+with open(outcome.test.log_path, encoding='utf-8') as f:
+    shutil.copyfileobj(f, sys.stdout)
 
-# 检查输出中是否包含 error/fatal/panic
-output = result.stdout + result.stderr
-if any(word in output.lower() for word in ['error', 'fatal', 'panic']):
+if outcome.decision.failed:
     print("\n=== TEST FAILED ===")
+    for reason in outcome.decision.reasons:
+        print(f"  {reason}")
     sys.exit(1)
 else:
     print("\n=== TEST PASSED ===")
@@ -1,16 +1,13 @@
 #!/usr/bin/env python3
-import subprocess
+import shutil
 import sys
 
+from harness import pipeline
+from harness.pipeline import GUARD, Step
+
 print("=== Running guard_bad_paths.py ===")
-result = subprocess.run(
-    ['python3', '/home/engine/project/scripts/guard_bad_paths.py'],
-    cwd='/home/engine/project',
-    capture_output=True,
-    text=True
-)
-print(result.stdout)
-if result.stderr:
-    print("Stderr:", result.stderr)
-print(f"Exit code: {result.returncode}")
-sys.exit(result.returncode)
+result = pipeline.run(pipeline.run_step(Step('guard', GUARD, cwd='/home/engine/project')))
+with open(result.log_path, encoding='utf-8') as f:
+    shutil.copyfileobj(f, sys.stdout)
+print(f"Exit code: {'timeout' if result.timed_out else result.exit_code}")
+sys.exit(1 if result.timed_out else result.exit_code)
@@ -1,58 +1,43 @@
 #!/usr/bin/env python3
 """执行moon test并分析结果的包装脚本"""
-import subprocess
-import os
 import sys
+from itertools import islice
+
+from harness import pipeline
+
+OUTPUT_FILE = '/tmp/moon_test_result.txt'
+
 
 def main():
-    os.chdir('/home/engine/project')
-    
-    # 设置PATH
-    env = os.environ.copy()
-    env['PATH'] = os.path.expanduser('~/.moon/bin') + ':' + env.get('PATH', '')
-    
-    # 执行moon test
-    result = subprocess.run(
-        ['moon', 'test'],
-        env=env,
-        capture_output=True,
-        text=True,
-        timeout=180
-    )
-    
-    output = result.stdout + result.stderr
-    
-    # 保存到文件
-    with open('/tmp/moon_test_result.txt', 'w', encoding='utf-8') as f:
-        f.write(f"=== Exit Code: {result.returncode} ===\n\n")
-        f.write("=== STDOUT ===\n")
-        f.write(result.stdout)
-        f.write("\n\n=== STDERR ===\n")
-        f.write(result.stderr)
-    
-    # 分析结果
-    has_error_keywords = any(
-        word in output.lower() 
-        for word in ['error', 'fatal', 'panic']
-    )
-    
+    # 执行moon test，输出边跑边写入 OUTPUT_FILE
+    outcome = pipeline.run(pipeline.run_task('/home/engine/project', test_log=OUTPUT_FILE,
+                                             guard=False))
+    if outcome is None:
+        print("Moon installation failed", file=sys.stderr)
+        return 2
+    test = outcome.test
+    decision = outcome.decision
+
     # 输出结果到stdout
-    print(f"Exit Code: {result.returncode}")
-    print(f"Has Error Keywords: {has_error_keywords}")
-    print(f"\nOutput length: {len(output)} characters")
-    print(f"Output saved to: /tmp/moon_test_result.txt")
-    
+    print(f"Exit Code: {'timeout' if test.timed_out else test.exit_code}")
+    summary = test.parser.summary
+    if summary:
+        print(f"Total tests: {summary.total}, passed: {summary.passed}, failed: {summary.failed}.")
+    for reason in decision.reasons:
+        print(f"  {reason}")
+    print(f"Output saved to: {OUTPUT_FILE}")
+
     # 输出前100行以便快速检查
-    lines = output.split('\n')
     print(f"\n=== First 100 lines of output ===")
-    for i, line in enumerate(lines[:100], 1):
-        print(f"{i:4d}: {line}")
-    
-    if len(lines) > 100:
-        print(f"\n... ({len(lines) - 100} more lines)")
-    
+    with open(OUTPUT_FILE, encoding='utf-8') as f:
+        for i, line in enumerate(islice(f, 100), 1):
+            print(f"{i:4d}: {line.rstrip()}")
+        rest = sum(1 for _ in f)
+    if rest:
+        print(f"\n... ({rest} more lines)")
+
     # 返回适当的退出码
-    if has_error_keywords or result.returncode != 0:
+    if decision.failed:
         print("\n=== RESULT: FAILED ===")
         return 1
     else:
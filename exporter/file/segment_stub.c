@@ -0,0 +1,107 @@
+#define _GNU_SOURCE
+#include <errno.h>
+#include <fcntl.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+// One open segment: the file, its mapping and the bytes written so far.
+// Handles cross into MoonBit as int64_t; failures come back as -errno.
+typedef struct {
+  int fd;
+  uint8_t *map;
+  size_t capacity;
+  size_t len;
+} moonotel_segment;
+
+int32_t moonotel_segment_mkdir(const char *path) {
+  if (mkdir(path, 0755) == 0 || errno == EEXIST) {
+    return 0;
+  }
+  return -errno;
+}
+
+// Create (or truncate) `path`, reserve `capacity` bytes and map them
+int64_t moonotel_segment_open(const char *path, int32_t capacity) {
+  if (capacity <= 0) {
+    return -EINVAL;
+  }
+  int fd = open(path, O_RDWR | O_CREAT | O_TRUNC | O_CLOEXEC, 0644);
+  if (fd < 0) {
+    return -errno;
+  }
+  // Reserve the blocks up front so a full disk fails here, not on a page
+  // fault mid-write; filesystems without fallocate get a sparse file
+  int err = posix_fallocate(fd, 0, capacity);
+  if (err != 0) {
+    err = ftruncate(fd, capacity) == 0 ? 0 : errno;
+  }
+  void *map = MAP_FAILED;
+  if (err == 0) {
+    map = mmap(NULL, (size_t)capacity, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    if (map == MAP_FAILED) {
+      err = errno;
+    }
+  }
+  moonotel_segment *seg = NULL;
+  if (err == 0) {
+    seg = malloc(sizeof *seg);
+    if (seg == NULL) {
+      err = ENOMEM;
+      munmap(map, (size_t)capacity);
+    }
+  }
+  if (err != 0) {
+    close(fd);
+    unlink(path);
+    return -err;
+  }
+  seg->fd = fd;
+  seg->map = map;
+  seg->capacity = (size_t)capacity;
+  seg->len = 0;
+  return (int64_t)(intptr_t)seg;
+}
+
+// Copy `len` bytes to the end of the segment; -ENOSPC past the capacity
+int32_t moonotel_segment_write(int64_t handle, const uint8_t *data, int32_t len) {
+  moonotel_segment *seg = (moonotel_segment *)(intptr_t)handle;
+  if (len < 0 || (size_t)len > seg->capacity - seg->len) {
+    return -ENOSPC;
+  }
+  memcpy(seg->map + seg->len, data, (size_t)len);
+  seg->len += (size_t)len;
+  return 0;
+}
+
+// Flush the written part of the mapping and the file metadata
+int32_t moonotel_segment_sync(int64_t handle) {
+  moonotel_segment *seg = (moonotel_segment *)(intptr_t)handle;
+  if (seg->len > 0 && msync(seg->map, seg->len, MS_SYNC) != 0) {
+    return -errno;
+  }
+  if (fsync(seg->fd) != 0) {
+    return -errno;
+  }
+  return 0;
+}
+
+// Unmap, truncate the preallocated tail away and close; frees the handle
+int32_t moonotel_segment_close(int64_t handle) {
+  moonotel_segment *seg = (moonotel_segment *)(intptr_t)handle;
+  int32_t status = 0;
+  if (munmap(seg->map, seg->capacity) != 0) {
+    status = -errno;
+  }
+  if (ftruncate(seg->fd, (off_t)seg->len) != 0 && status == 0) {
+    status = -errno;
+  }
+  if (close(seg->fd) != 0 && status == 0) {
+    status = -errno;
+  }
+  free(seg);
+  return status;
+}
@@ -2,54 +2,10 @@
 """
 最终任务执行脚本
 """
-import subprocess
-import os
 import sys
-import time
 from pathlib import Path
 
-def setup_environment():
-    """设置环境变量"""
-    env = os.environ.copy()
-    moon_bin = str(Path.home() / '.moon' / 'bin')
-    env['PATH'] = moon_bin + ':' + env.get('PATH', '')
-    # 禁用所有分页器
-    env['PAGER'] = 'cat'
-    env['GIT_PAGER'] = 'cat'
-    env['LESS'] = ''
-    env['MORE'] = ''
-    return env
-
-def run_subprocess(cmd, shell=False, cwd=None, env=None, timeout=180):
-    """运行子进程并返回结果"""
-    try:
-        if shell:
-            result = subprocess.run(
-                cmd,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                cwd=cwd,
-                env=env
-            )
-        else:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                cwd=cwd,
-                env=env
-            )
-        return result.stdout, result.stderr, result.returncode
-    except subprocess.TimeoutExpired:
-        return '', 'Command timed out', -1
-
-def log(message):
-    """输出日志"""
-    timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-    print(f"[{timestamp}] {message}")
+from harness import pipeline
 
 def main():
     # 设置日志文件
@@ -64,96 +20,51 @@ def main():
     log_to_file("开始执行 MoonBit 测试任务")
     log_to_file("="*70)
     
-    # 设置环境
-    env = setup_environment()
     project_dir = Path('/home/engine/project')
-    
+
     # ===== 第一步：Git pull（已在开始前等待1分钟并执行） =====
     log_to_file("\n[第一步] Git pull - 已完成（等待1分钟后执行）")
-    
-    # ===== 第二步：配置 moonbit 环境 =====
+
+    # ===== 第二步、第三步：配置环境后，moon test 与路径检查并行执行 =====
     log_to_file("\n[第二步] 配置 moonbit 环境")
-    
-    # 检查moon是否安装
-    stdout, stderr, code = run_subprocess(['which', 'moon'], env=env)
-    if code == 0:
-        log_to_file(f"✓ Moon 已安装在: {stdout.strip()}")
-    else:
-        log_to_file("Moon 未安装，正在安装...")
-        stdout, stderr, code = run_subprocess(
-            'curl -fsSL https://cli.moonbitlang.com/install/unix.sh | bash',
-            shell=True,
-            timeout=60,
-            env=env
-        )
-        if code == 0:
-            log_to_file("✓ Moon 安装成功")
-        else:
-            log_to_file(f"✗ Moon 安装失败: {stderr}")
-            return 2
-    
-    # 获取moon版本
-    stdout, stderr, code = run_subprocess(['moon', '--version'], timeout=30, env=env)
-    if code == 0:
-        log_to_file(f"Moon 版本: {stdout.strip()}")
-    
-    # ===== 第三步：执行 moon test =====
     log_to_file("\n[第三步] 执行 moon test")
     log_to_file("（这可能需要 1-3 分钟...）")
-    
-    stdout, stderr, code = run_subprocess(
-        ['moon', 'test'],
-        timeout=180,
-        cwd=project_dir,
-        env=env
-    )
-    
-    full_output = stdout + stderr
-    
-    # 保存完整输出
+
+    # 边读边解析 moon test 输出，失败用例出现即打印
+    def report_failure(result):
+        if result.status != 'ok':
+            log_to_file(f"✗ {result.key}: {result.message}")
+
     output_file = Path('/tmp/moon_test_output.txt')
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(f"退出码: {code}\n")
-        f.write(f"\n{'='*70}\nSTDOUT ({len(stdout)} 字符):\n{'='*70}\n")
-        f.write(stdout)
-        if stderr:
-            f.write(f"\n{'='*70}\nSTDERR ({len(stderr)} 字符):\n{'='*70}\n")
-            f.write(stderr)
-    
-    log_to_file(f"\n测试退出码: {code}")
-    log_to_file(f"STDOUT 长度: {len(stdout)} 字符")
-    if stderr:
-        log_to_file(f"STDERR 长度: {len(stderr)} 字符")
+    outcome = pipeline.run(pipeline.run_task(project_dir, test_log=output_file,
+                                             on_result=report_failure))
+    if outcome is None:
+        log_to_file("✗ Moon 安装失败")
+        return 2
+    log_to_file(f"✓ Moon 已安装在: {outcome.moon}")
+    log_to_file(f"Moon 版本: {outcome.version}")
+
+    test = outcome.test
+    parser = test.parser
+    log_to_file(f"\n测试退出码: {test.exit_code if not test.timed_out else '超时'}")
+    if parser.summary:
+        s = parser.summary
+        log_to_file(f"Total tests: {s.total}, passed: {s.passed}, failed: {s.failed}.")
     log_to_file(f"完整输出已保存到: {output_file}")
-    
-    # 显示前150行
-    lines = stdout.split('\n')
-    log_to_file(f"\n测试输出（前150行）:")
-    for i, line in enumerate(lines[:150], 1):
-        print(f"{i:4d}: {line}")
-    if len(lines) > 150:
-        log_to_file(f"... (总共 {len(lines)} 行)")
-    
+
     # ===== 第四步：分析结果 =====
     log_to_file("\n[第四步] 分析测试结果")
-    
-    # 检查关键词
-    keywords = ['error', 'fatal', 'panic']
-    found_keywords = [kw for kw in keywords if kw in full_output.lower()]
-    
-    has_error = len(found_keywords) > 0
-    test_failed = has_error or code != 0
-    
-    if test_failed:
+
+    decision = outcome.decision
+
+    if decision.failed:
         # ===== 分支A：测试失败 =====
         log_to_file("="*70)
-        log_to_file("分支 A：测试失败（或日志包含 error/fatal/panic）")
+        log_to_file("分支 A：测试失败（失败/panic 用例、编译错误或非零退出码）")
         log_to_file("="*70)
         
-        if found_keywords:
-            log_to_file(f"✓ 检测到关键词: {', '.join(found_keywords)}")
-        if code != 0:
-            log_to_file(f"✓ 退出码非零: {code}")
+        for reason in decision.reasons:
+            log_to_file(f"✓ {reason}")
         
         log_to_file("\n接下来的操作:")
         log_to_file("1. 检查并消除代码中的死循环")
@@ -178,16 +89,8 @@ def main():
         
         # 执行步骤1：运行 guard_bad_paths.py
         log_to_file("\n执行步骤1: python3 scripts/guard_bad_paths.py")
-        stdout, stderr, code = run_subprocess(
-            ['python3', 'scripts/guard_bad_paths.py'],
-            cwd=project_dir,
-            env=env
-        )
-        
         log_to_file("guard_bad_paths.py 输出:")
-        log_to_file(stdout)
-        if stderr:
-            log_to_file(f"警告: {stderr}")
+        log_to_file(outcome.guard.output)
         
         log_to_file("\n" + "="*70)
         log_to_file("任务完成：测试通过")
@@ -201,10 +104,10 @@ def main():
 if __name__ == '__main__':
     try:
         exit_code = main()
-        log_to_file(f"\n任务完成，退出码: {exit_code}")
+        pipeline.log(f"\n任务完成，退出码: {exit_code}")
         sys.exit(exit_code)
     except Exception as e:
-        log_to_file(f"\n!!! 错误: {e} !!!")
+        pipeline.log(f"\n!!! 错误: {e} !!!")
         import traceback
-        log_to_file(traceback.format_exc())
+        pipeline.log(traceback.format_exc())
         sys.exit(2)
@@ -0,0 +1 @@
+"""Test and tooling harness for the MoonBit otel module."""
@@ -0,0 +1,262 @@
+"""Command-line entry point: `python3 -m harness <command>`."""
+import argparse
+import asyncio
+import json
+import sys
+
+from . import bench, collector, daemon, dedupe, loadgen, matrix, runner, segments, selection, timings
+from .toolchain import find_moon
+
+
+def require_moon():
+    if find_moon() is None:
+        print('moon not found; install with '
+              'curl -fsSL https://cli.moonbitlang.com/install/unix.sh | bash', file=sys.stderr)
+        return False
+    return True
+
+
+def cmd_test(args):
+    if args.daemon:
+        return test_via_daemon(args)
+    if not require_moon():
+        return 2
+    test_files, fingerprints = None, {}
+    if args.changed:
+        test_files, fingerprints, total = selection.select()
+        print(f'Selected {len(test_files)} of {total} test files')
+        if not test_files:
+            return 0
+    extra = ('--verbose',) if args.verbose else ()
+    report = runner.run(jobs=args.jobs, timeout=args.timeout, test_files=test_files, extra_args=extra)
+    if fingerprints:
+        selection.record(report, fingerprints)
+    runner.print_report(report)
+    print(f'Report: {runner.write_report(report, args.report)}')
+    return runner.exit_code(report)
+
+
+def test_via_daemon(args):
+    payload = {'op': 'test', 'changed': args.changed, 'jobs': args.jobs,
+               'timeout': args.timeout, 'verbose': args.verbose}
+    try:
+        reply = daemon.request(payload)
+    except OSError as e:
+        print(f'harness daemon not reachable ({e}); start it with `python3 -m harness daemon start`',
+              file=sys.stderr)
+        return 2
+    if not reply['ok']:
+        print(f"daemon error: {reply['error']}", file=sys.stderr)
+        return 2
+    report = reply['result']
+    runner.print_report(report)
+    print(f'Report: {runner.write_report(report, args.report)}')
+    return report['exit_code']
+
+
+def cmd_daemon(args):
+    if args.action == 'start':
+        if not require_moon():
+            return 2
+        try:
+            daemon.serve(jobs=args.jobs)
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            return 2
+        return 0
+    if not daemon.is_running():
+        print('harness daemon is not running')
+        return 1
+    reply = daemon.request({'op': 'shutdown' if args.action == 'stop' else 'status'})
+    if args.action == 'status':
+        for key, value in reply['result'].items():
+            print(f'{key}: {value}')
+    return 0
+
+
+def cmd_select(args):
+    test_files, _, total = selection.select()
+    for tf in test_files:
+        print(tf.key)
+    print(f'{len(test_files)} of {total} test files selected', file=sys.stderr)
+    return 0
+
+
+def cmd_bench(args):
+    if not require_moon():
+        return 2
+    targets = [t for t in args.targets.split(',') if t]
+    run_data = bench.run(targets)
+    print(f'Results: {bench.save_run(run_data)}')
+    for target, error in sorted(run_data['errors'].items()):
+        status = 'timed out' if error['exit_code'] is None else f"exited with {error['exit_code']}"
+        print(f"{target}: moon bench {status} (log: {error['log']})")
+    rows = bench.compare(run_data, bench.load_baseline(), args.threshold)
+    bench.print_comparison(rows)
+    if args.save_baseline:
+        print(f'Baseline saved: {bench.save_baseline(run_data)}')
+        return 0
+    if run_data['errors']:
+        return 2
+    return 1 if any(row[-1] for row in rows) else 0
+
+
+def cmd_matrix(args):
+    if not require_moon():
+        return 2
+    backends = [b for b in args.backends.split(',') if b]
+    unknown = [b for b in backends if b not in matrix.BACKENDS]
+    if unknown:
+        print(f"unknown backend(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    rows = matrix.run(backends, jobs=args.jobs, timeout=args.timeout, force=args.force)
+    matrix.print_table(rows)
+    return matrix.exit_code(rows)
+
+
+def cmd_slow(args):
+    timings.print_slowest(timings.History(), 'files' if args.files else 'tests', args.n, args.window)
+    return 0
+
+
+def cmd_collector(args):
+    faults = collector.Faults(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                              rate_429=args.rate_429, rate_503=args.rate_503,
+                              partial_rate=args.partial_rate, retry_after=args.retry_after,
+                              seed=args.seed)
+    server = collector.Collector(faults)
+    try:
+        asyncio.run(collector.serve(args.host, args.port, duration=args.duration, collector=server))
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(server.stats.as_dict(), indent=2))
+    return 0
+
+
+def cmd_load(args):
+    result = asyncio.run(loadgen.drive(args.url, args.connections, args.batch_size,
+                                       args.duration, args.gzip))
+    print(json.dumps(result.summary(), indent=2))
+    return 1 if result.errors else 0
+
+
+def cmd_segments(args):
+    totals = {'records': 0, 'batches': 0, 'spans': 0, 'bytes': 0}
+    status = 0
+    for path in args.paths:
+        try:
+            summary = segments.read_segment(path)
+        except (OSError, ValueError) as e:
+            print(f'{path}: {e}', file=sys.stderr)
+            status = 1
+            continue
+        for key in totals:
+            totals[key] += summary[key]
+        print(f"{path}: {summary['format']}, {summary['records']} records, "
+              f"{summary['spans']} spans, {summary['bytes']} bytes")
+    if len(args.paths) > 1:
+        print(f"total: {totals['records']} records, {totals['spans']} spans, {totals['bytes']} bytes")
+    return status
+
+
+def cmd_dupes(args):
+    report = dedupe.analyze(args.package)
+    dedupe.print_report(report, near=args.near, limit=args.limit)
+    if args.emit:
+        written = dedupe.emit(report, args.emit, near=args.near)
+        print(f'wrote {len(written)} of {len(report.files)} files to {args.emit}')
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='harness')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    test = sub.add_parser('test', help='run moon test sharded across worker processes')
+    test.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    test.add_argument('--timeout', type=float, default=600, help='per-shard timeout in seconds')
+    test.add_argument('--report', default=None, help='where to write the JSON report')
+    test.add_argument('--changed', action='store_true',
+                      help='only run test files whose inputs changed since they last passed')
+    test.add_argument('--verbose', action='store_true',
+                      help='ask moon to print every test, giving per-test timings')
+    test.add_argument('--daemon', action='store_true',
+                      help='send the run to a running `harness daemon` instead of starting workers')
+    test.set_defaults(func=cmd_test)
+
+    daemon_p = sub.add_parser('daemon', help='keep the toolchain and workers warm behind a Unix socket')
+    daemon_p.add_argument('action', choices=('start', 'stop', 'status'))
+    daemon_p.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    daemon_p.set_defaults(func=cmd_daemon)
+
+    slow = sub.add_parser('slow', help='show the slowest tests or files with their recent trend')
+    slow.add_argument('-n', type=int, default=10, help='rows to show')
+    slow.add_argument('--files', action='store_true', help='rank test files instead of tests')
+    slow.add_argument('--window', type=int, default=5, help='recent runs used for the trend')
+    slow.set_defaults(func=cmd_slow)
+
+    select = sub.add_parser('select', help='list the test files --changed would run')
+    select.set_defaults(func=cmd_select)
+
+    bench_p = sub.add_parser('bench', help='run moon bench per backend and compare with the baseline')
+    bench_p.add_argument('--targets', default=','.join(bench.DEFAULT_TARGETS),
+                         help='comma-separated backends (default: %(default)s)')
+    bench_p.add_argument('--threshold', type=float, default=0.10,
+                         help='relative slowdown that counts as a regression (default: 0.10)')
+    bench_p.add_argument('--save-baseline', action='store_true',
+                         help='store this run as bench/baseline.json')
+    bench_p.set_defaults(func=cmd_bench)
+
+    matrix_p = sub.add_parser('matrix', help='build and test every backend in parallel')
+    matrix_p.add_argument('--backends', default=','.join(matrix.DEFAULT_BACKENDS),
+                          help='comma-separated backends (default: %(default)s)')
+    matrix_p.add_argument('-j', '--jobs', type=int, default=None,
+                          help='parallel backends (default: one worker per backend)')
+    matrix_p.add_argument('--timeout', type=float, default=1800, help='per-backend timeout in seconds')
+    matrix_p.add_argument('--force', action='store_true', help='ignore cached results')
+    matrix_p.set_defaults(func=cmd_matrix)
+
+    coll = sub.add_parser('collector', help='run the local OTLP/HTTP collector stand-in')
+    coll.add_argument('--host', default='127.0.0.1')
+    coll.add_argument('--port', type=int, default=4318)
+    coll.add_argument('--duration', type=float, default=None, help='stop after N seconds and print stats')
+    coll.add_argument('--latency-ms', type=float, default=0.0, help='fixed delay per export')
+    coll.add_argument('--jitter-ms', type=float, default=0.0, help='extra uniform random delay')
+    coll.add_argument('--rate-429', type=float, default=0.0, help='share of exports answered 429')
+    coll.add_argument('--rate-503', type=float, default=0.0, help='share of exports answered 503')
+    coll.add_argument('--partial-rate', type=float, default=0.0,
+                      help='share of accepted exports answered with partial_success')
+    coll.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds on 429/503')
+    coll.add_argument('--seed', type=int, default=None)
+    coll.set_defaults(func=cmd_collector)
+
+    load = sub.add_parser('load', help='drive an OTLP/HTTP endpoint and report sustained spans/s')
+    load.add_argument('--url', default='http://127.0.0.1:4318/v1/traces')
+    load.add_argument('-c', '--connections', type=int, default=8)
+    load.add_argument('--batch-size', type=int, default=512)
+    load.add_argument('--duration', type=float, default=10.0)
+    load.add_argument('--gzip', action='store_true')
+    load.set_defaults(func=cmd_load)
+
+    seg = sub.add_parser('segments', help='summarize segment files written by the file exporter')
+    seg.add_argument('paths', nargs='+')
+    seg.set_defaults(func=cmd_segments)
+
+    dupes = sub.add_parser('dupes', help='report duplicate test blocks in a package')
+    dupes.add_argument('package', nargs='?', default='api', help='package directory (default: %(default)s)')
+    dupes.add_argument('--near', action='store_true',
+                       help='also treat tests equal up to local names and literal spelling as duplicates')
+    dupes.add_argument('--limit', type=int, default=20, help='groups to list per kind')
+    dupes.add_argument('--emit', metavar='DIR', default=None,
+                       help='write the package with redundant tests removed to DIR')
+    dupes.set_defaults(func=cmd_dupes)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
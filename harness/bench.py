@@ -0,0 +1,157 @@
+"""Benchmark driver: runs `moon bench` per backend and tracks regressions.
+
+Backends are benchmarked one after another, never concurrently, so they do not
+compete for CPU. Each run is saved under `.harness/bench/`; `--save-baseline`
+promotes it to `bench/baseline.json`, which later runs are compared against.
+A benchmark regresses when its mean exceeds the baseline mean by more than the
+threshold.
+
+moon prints each benchmark as a record line naming the test followed by a
+statistics line:
+
+    [yourname/otel] bench api/span_context_bench_test.mbt:10 ("bench_trace_id_hex") ok
+    time (mean ± σ)         range (min … max)
+      21.43 ns ±   0.35 ns    21.02 ns …  22.10 ns  in 10 ×  4665 runs
+"""
+import json
+import re
+import subprocess
+import time
+
+from .stream import run_streaming
+from .toolchain import REPO_ROOT, find_moon, setup_environment, state_path
+
+DEFAULT_TARGETS = ('wasm-gc', 'native', 'js')
+BASELINE = REPO_ROOT / 'bench' / 'baseline.json'
+
+RECORD = re.compile(
+    r'^(?:\[[^\]]+\]\s+)?(?:bench|test)\s+(?P<target>\S+?)'
+    r'(?:::(?P<name>.+?)|\s+\("(?P<quoted>.*)"\))?(?:\s+(?:ok|failed)\b.*)?$'
+)
+_UNIT = r'(ns|µs|us|ms|s)'
+STATS = re.compile(
+    rf'(?P<mean>[\d.]+)\s*{_UNIT}\s*±\s*(?P<sd>[\d.]+)\s*{_UNIT}\s+'
+    rf'(?P<min>[\d.]+)\s*{_UNIT}\s*…\s*(?P<max>[\d.]+)\s*{_UNIT}\s+'
+    r'in\s+(?P<batches>\d+)\s*×\s*(?P<runs>\d+)\s+runs'
+)
+SCALE = {'ns': 1.0, 'µs': 1e3, 'us': 1e3, 'ms': 1e6, 's': 1e9}
+
+
+def parse_bench_output(lines):
+    """Return {"<file>::<name>": stats} from moon bench output lines."""
+    results = {}
+    current = None
+    for line in lines:
+        line = line.rstrip('\n')
+        record = RECORD.match(line)
+        if record:
+            file = record.group('target').split(':', 1)[0].rsplit('/', 1)[-1]
+            name = record.group('name') or record.group('quoted')
+            current = f'{file}::{name}' if name else file
+            continue
+        stats = STATS.search(line)
+        if stats and current:
+            units = stats.groups()[1::2][:4]
+            mean, sd, lo, hi = (float(stats.group(g)) * SCALE[u]
+                                for g, u in zip(('mean', 'sd', 'min', 'max'), units))
+            results[current] = {
+                'mean_ns': mean,
+                'stddev_ns': sd,
+                'min_ns': lo,
+                'max_ns': hi,
+                'runs': int(stats.group('batches')) * int(stats.group('runs')),
+            }
+            current = None
+    return results
+
+
+def run_target(target, timeout=1800):
+    """Run `moon bench` for one backend; returns (results, exit code, log path).
+
+    The exit code is None when the run was killed on timeout.
+    """
+    env = setup_environment()
+    moon = find_moon(env) or 'moon'
+    log_path = state_path('bench', f'{target}.log')
+    cmd = [moon, 'bench', '--target', target,
+           '--target-dir', str(state_path('bench', target, 'target'))]
+    lines = []
+    with open(log_path, 'w', encoding='utf-8') as log:
+        outcome = run_streaming(cmd, cwd=REPO_ROOT, env=env, log_file=log,
+                                timeout=timeout, on_line=lines.append)
+    if outcome.timed_out:
+        return {}, None, str(log_path)
+    return parse_bench_output(lines), outcome.exit_code, str(log_path)
+
+
+def _git_rev():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def run(targets=DEFAULT_TARGETS, timeout=1800):
+    run_data = {'timestamp': time.time(), 'git_rev': _git_rev(), 'targets': {}, 'errors': {}}
+    for target in targets:
+        results, code, log = run_target(target, timeout)
+        run_data['targets'][target] = results
+        if code != 0:
+            run_data['errors'][target] = {'exit_code': code, 'log': log}
+    return run_data
+
+
+def save_run(run_data):
+    path = state_path('bench', time.strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(run_data, f, indent=2, sort_keys=True)
+    return path
+
+
+def save_baseline(run_data, path=BASELINE):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(run_data, f, indent=2, sort_keys=True)
+        f.write('\n')
+    return path
+
+
+def load_baseline(path=BASELINE):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def compare(run_data, baseline, threshold=0.10):
+    """Return rows (target, bench, base_ns, current_ns, ratio, regressed)."""
+    rows = []
+    for target, results in sorted(run_data['targets'].items()):
+        base_results = baseline.get('targets', {}).get(target, {}) if baseline else {}
+        for key, stats in sorted(results.items()):
+            base = base_results.get(key)
+            if base is None or base['mean_ns'] <= 0:
+                rows.append((target, key, None, stats['mean_ns'], None, False))
+                continue
+            ratio = stats['mean_ns'] / base['mean_ns']
+            rows.append((target, key, base['mean_ns'], stats['mean_ns'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def _fmt_ns(value):
+    if value is None:
+        return '-'
+    for unit, scale in (('s', 1e9), ('ms', 1e6), ('µs', 1e3)):
+        if value >= scale:
+            return f'{value / scale:.2f} {unit}'
+    return f'{value:.1f} ns'
+
+
+def print_comparison(rows):
+    print(f"{'target':<8} {'benchmark':<56} {'baseline':>11} {'current':>11} {'change':>8}")
+    for target, key, base, cur, ratio, regressed in rows:
+        change = '-' if ratio is None else f'{(ratio - 1) * 100:+.1f}%'
+        flag = '  REGRESSION' if regressed else ''
+        print(f'{target:<8} {key:<56} {_fmt_ns(base):>11} {_fmt_ns(cur):>11} {change:>8}{flag}')
@@ -0,0 +1,235 @@
+"""Local OTLP/HTTP collector stand-in.
+
+An asyncio HTTP/1.1 server that accepts `POST /v1/traces` the way an
+OpenTelemetry Collector does, so exporter throughput and backpressure can be
+measured offline without Docker. Bodies may be `application/x-protobuf`
+(decoded with `otlp_proto`) or `application/json`, optionally gzip-encoded.
+Spans, batches (ScopeSpans), requests and bytes are counted, and faults can be
+injected: fixed plus random latency, 429 and 503 responses with
+`Retry-After`, and 200 replies carrying `partial_success`.
+
+`GET /stats` returns the counters as JSON; they are also printed on exit.
+"""
+import asyncio
+import gzip
+import json
+import random
+import time
+import zlib
+from dataclasses import asdict, dataclass, field
+
+from . import otlp_proto
+
+TRACES_PATH = '/v1/traces'
+MAX_BODY = 64 * 1024 * 1024
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 415: 'Unsupported Media Type', 429: 'Too Many Requests',
+           503: 'Service Unavailable'}
+
+
+class BadRequest(ConnectionError):
+    """A request that cannot be read; answered with `status` and the connection closed."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Faults:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    rate_429: float = 0.0
+    rate_503: float = 0.0
+    partial_rate: float = 0.0  # share of accepted requests answered with partial_success
+    retry_after: int = 1
+    seed: int = None
+
+
+@dataclass
+class Stats:
+    started: float = field(default_factory=time.monotonic)
+    requests: int = 0
+    accepted_requests: int = 0
+    batches: int = 0
+    spans: int = 0
+    rejected_spans: int = 0
+    invalid_spans: int = 0
+    wire_bytes: int = 0
+    body_bytes: int = 0
+    decode_errors: int = 0
+    statuses: dict = field(default_factory=dict)
+
+    def as_dict(self):
+        data = asdict(self)
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        del data['started']
+        data['seconds'] = round(elapsed, 3)
+        data['spans_per_second'] = round(self.spans / elapsed, 1)
+        return data
+
+
+class Collector:
+    def __init__(self, faults=None):
+        self.faults = faults or Faults()
+        self.random = random.Random(self.faults.seed)
+        self.stats = Stats()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, extra, payload = await self.respond(method, path, headers, body)
+                self.stats.statuses[str(status)] = self.stats.statuses.get(str(status), 0) + 1
+                write_response(writer, status, extra, payload)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except BadRequest as e:
+            self.stats.statuses[str(e.status)] = self.stats.statuses.get(str(e.status), 0) + 1
+            write_response(writer, e.status, {'Connection': 'close'}, str(e).encode())
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, method, path, headers, body):
+        path = path.split('?', 1)[0]
+        if path == '/stats' and method == 'GET':
+            return 200, {'Content-Type': 'application/json'}, json.dumps(self.stats.as_dict()).encode()
+        if path != TRACES_PATH:
+            return 404, {}, b''
+        if method != 'POST':
+            return 405, {}, b''
+        self.stats.requests += 1
+        self.stats.wire_bytes += len(body)
+
+        faults = self.faults
+        delay = faults.latency_ms + self.random.random() * faults.jitter_ms
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        roll = self.random.random()
+        if roll < faults.rate_429:
+            return 429, {'Retry-After': str(faults.retry_after)}, b''
+        if roll < faults.rate_429 + faults.rate_503:
+            return 503, {'Retry-After': str(faults.retry_after)}, b''
+
+        if headers.get('content-encoding', '').lower() == 'gzip':
+            try:
+                body = gzip.decompress(body)
+            except (OSError, EOFError, zlib.error):
+                self.stats.decode_errors += 1
+                return 400, {}, b''
+        self.stats.body_bytes += len(body)
+        content_type = headers.get('content-type', '').split(';', 1)[0].strip().lower()
+        try:
+            if content_type == 'application/x-protobuf':
+                batches, spans, invalid = otlp_proto.summarize_request(body)
+            elif content_type == 'application/json':
+                batches, spans, invalid = summarize_json(json.loads(body))
+            else:
+                return 415, {}, b''
+        except (otlp_proto.DecodeError, ValueError):
+            self.stats.decode_errors += 1
+            return 400, {}, b''
+
+        self.stats.accepted_requests += 1
+        self.stats.batches += batches
+        self.stats.spans += spans
+        self.stats.invalid_spans += invalid
+        rejected = invalid
+        if spans and self.random.random() < faults.partial_rate:
+            rejected = max(rejected, (spans + 1) // 2)
+        self.stats.rejected_spans += rejected
+        if content_type == 'application/json':
+            reply = {'partialSuccess': {'rejectedSpans': str(rejected), 'errorMessage': 'rejected by stand-in'}
+                     } if rejected else {}
+            return 200, {'Content-Type': 'application/json'}, json.dumps(reply).encode()
+        reply = otlp_proto.encode_partial_success(rejected, 'rejected by stand-in') if rejected else b''
+        return 200, {'Content-Type': 'application/x-protobuf'}, reply
+
+
+def summarize_json(message):
+    """Return (batches, spans, invalid spans); ValueError if the shape is not OTLP/JSON."""
+    batches = spans = invalid = 0
+    for resource_spans in _json_list(message, 'resourceSpans'):
+        for scope_spans in _json_list(resource_spans, 'scopeSpans'):
+            batches += 1
+            for span in _json_list(scope_spans, 'spans'):
+                spans += 1
+                if not isinstance(span, dict):
+                    raise ValueError('span is not an object')
+                trace_id, span_id = span.get('traceId', ''), span.get('spanId', '')
+                if not (isinstance(trace_id, str) and len(trace_id) == 32
+                        and isinstance(span_id, str) and len(span_id) == 16):
+                    invalid += 1
+    return batches, spans, invalid
+
+
+def _json_list(obj, key):
+    if not isinstance(obj, dict):
+        raise ValueError(f'expected an object holding {key!r}')
+    value = obj.get(key, [])
+    if not isinstance(value, list):
+        raise ValueError(f'{key!r} is not an array')
+    return value
+
+
+async def read_request(reader):
+    """Read one HTTP/1.1 request; None at a clean end of stream."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, path, _ = line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise BadRequest('malformed request line')
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length', '0') or 0)
+    except ValueError:
+        raise BadRequest('malformed Content-Length')
+    if length < 0:
+        raise BadRequest('malformed Content-Length')
+    if length > MAX_BODY:
+        raise BadRequest('body too large', 413)
+    body = await reader.readexactly(length) if length else b''
+    return method, path, headers, body
+
+
+def write_response(writer, status, headers, body):
+    head = [f'HTTP/1.1 {status} {REASONS.get(status, "")}', f'Content-Length: {len(body)}']
+    head.extend(f'{k}: {v}' for k, v in headers.items())
+    writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+
+
+async def serve(host='127.0.0.1', port=4318, faults=None, duration=None, collector=None):
+    """Serve until cancelled (or for `duration` seconds); return the final stats.
+
+    Pass a `collector` to keep its stats reachable if the loop is interrupted.
+    """
+    collector = collector or Collector(faults)
+    server = await asyncio.start_server(collector.handle_connection, host, port)
+    print(f'OTLP/HTTP stand-in listening on http://{host}:{port}{TRACES_PATH}', flush=True)
+    try:
+        async with server:
+            if duration:
+                await asyncio.sleep(duration)
+            else:
+                await server.serve_forever()
+    except asyncio.CancelledError:
+        pass
+    return collector.stats.as_dict()
@@ -0,0 +1,149 @@
+"""Long-lived harness service on a local Unix socket.
+
+Every one-shot script pays for toolchain discovery (`which moon`,
+`moon --version`, environment setup) and for starting worker processes before
+a single test runs. The daemon does that once: it resolves the toolchain at
+start-up, keeps a process pool warm, and serves requests until told to stop.
+
+The protocol is one JSON object per line, one request per connection:
+
+    {"op": "status"}
+    {"op": "test", "files": ["api/x_test.mbt"], "changed": false,
+     "jobs": 4, "timeout": 600, "verbose": false}
+    {"op": "shutdown"}
+
+Each reply is one JSON line with `ok` plus the structured result; for `test`
+that is the same report `python3 -m harness test` writes. Test requests are
+run one at a time because shards share their build directories.
+"""
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import runner, selection
+from .packages import iter_test_files, load_packages
+from .toolchain import find_moon, setup_environment, state_path
+
+SOCKET_NAME = 'daemon.sock'
+
+
+def socket_path():
+    return state_path(SOCKET_NAME)
+
+
+def _warm(_):
+    return os.getpid()
+
+
+class Service:
+    def __init__(self, jobs=None):
+        self.env = setup_environment()
+        self.moon = find_moon(self.env)
+        if self.moon is None:
+            raise RuntimeError('moon not found')
+        self.version = subprocess.run([self.moon, '--version'], env=self.env, capture_output=True,
+                                      text=True).stdout.strip()
+        self.jobs = jobs or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.jobs)
+        # Start every worker now rather than on the first request
+        list(self.pool.map(_warm, range(self.jobs)))
+        self.started = time.time()
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def status(self, request):
+        return {'moon': self.moon, 'version': self.version, 'jobs': self.jobs,
+                'pid': os.getpid(), 'uptime': round(time.time() - self.started, 3),
+                'requests': self.requests}
+
+    def test(self, request):
+        fingerprints = {}
+        with self.lock:
+            if request.get('changed'):
+                test_files, fingerprints, _ = selection.select()
+            else:
+                test_files = list(iter_test_files(load_packages()))
+                wanted = request.get('files')
+                if wanted:
+                    test_files = [tf for tf in test_files if tf.key in set(wanted)]
+            jobs = min(request.get('jobs') or self.jobs, self.jobs)
+            extra = ('--verbose',) if request.get('verbose') else ()
+            report = runner.run(jobs=jobs, timeout=request.get('timeout', 600), test_files=test_files,
+                                extra_args=extra, pool=self.pool, env=self.env, moon=self.moon)
+            if fingerprints:
+                selection.record(report, fingerprints)
+        report['exit_code'] = runner.exit_code(report)
+        return report
+
+    def handle(self, request):
+        self.requests += 1
+        op = request.get('op')
+        if op == 'status':
+            return self.status(request)
+        if op == 'test':
+            return self.test(request)
+        raise ValueError(f'unknown op: {op!r}')
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        service = self.server.service
+        try:
+            request = json.loads(self.rfile.readline())
+            if request.get('op') == 'shutdown':
+                reply = {'ok': True}
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            else:
+                reply = {'ok': True, 'result': service.handle(request)}
+        except Exception as e:
+            reply = {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+        self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(path=None, jobs=None):
+    """Run the service in the foreground until a shutdown request arrives."""
+    path = path or socket_path()
+    if os.path.exists(path):
+        if is_running(path):
+            raise RuntimeError(f'daemon already listening on {path}')
+        os.unlink(path)
+    service = Service(jobs)
+    server = _Server(str(path), _Handler)
+    server.service = service
+    print(f'harness daemon: {service.version or service.moon}, {service.jobs} workers, {path}', flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def request(payload, path=None, timeout=None):
+    """Send one request to the daemon and return its decoded reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(path or socket_path()))
+        sock.sendall(json.dumps(payload).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as reply:
+            return json.loads(reply.readline())
+
+
+def is_running(path=None):
+    try:
+        return request({'op': 'status'}, path, timeout=5)['ok']
+    except (OSError, ValueError):
+        return False
@@ -0,0 +1,283 @@
+"""Find duplicate test blocks in a package and emit a deduplicated layout.
+
+Every top-level `test "..." { ... }` block is cut out of its file and its body
+normalized twice:
+
+- exact: comments and layout dropped, so tests that differ only in name,
+  whitespace or comments collide;
+- near: additionally, names bound with `let` / `for` are renamed in order of
+  first use and integer literals are written in decimal, so `let ctx = ...`
+  and `let sc = ...`, or `0x10` and `16`, collide too.
+
+Blocks are grouped by the hash of the normalized body. In each group one copy
+is kept, preferring files whose names do not look like generated filler
+(`additional_*`, `extra_*`, `new_*`, ...); the others are reported as
+redundant together with their size and an estimate of the time they cost.
+That estimate is the file's median `moon test -f` time from the timings
+history (compile and run), shared out by lines, so it is only as good as the
+history. Files never timed are costed by lines only.
+
+`emit` writes the package's `.mbt` files with the redundant blocks removed,
+dropping files that end up with nothing in them.
+"""
+import hashlib
+import re
+import statistics
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .timings import History
+from .toolchain import REPO_ROOT
+
+TOKEN = re.compile(r'''
+    (?P<comment>//[^\n]*)
+  | (?P<multiline>\#\|[^\n]*)
+  | (?P<string>b?"(?:\\.|[^"\\\n])*")
+  | (?P<char>b?'(?:\\.|[^'\\\n])+')
+  | (?P<number>(?:0[xX][0-9a-fA-F_]+|0[bB][01_]+|0[oO][0-7_]+|\d[\d_]*(?:\.\d+)?(?:[eE][+-]?\d+)?)[A-Za-z]*)
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<space>\s+)
+  | (?P<punct>.)
+''', re.X | re.S)
+TEST_START = re.compile(r'^test\b', re.M)
+FILLER_NAME = re.compile(r'^(additional|advanced|comprehensive|enhanced|exhaustive|extended|extra|final|'
+                         r'new|supplementary|task_generated)_')
+INT_SUFFIX = re.compile(r'^(.*?)(UL|L|U|N)?$')
+
+
+@dataclass
+class TestBlock:
+    path: Path
+    name: str
+    start: int  # offset of the block, including the comment lines directly above it
+    end: int  # offset just past the closing brace (and its newline)
+    lines: int
+    exact: str = ''
+    near: str = ''
+
+
+@dataclass
+class Group:
+    key: str
+    blocks: list
+    keep: TestBlock = None
+
+    @property
+    def redundant(self):
+        return [b for b in self.blocks if b is not self.keep]
+
+
+@dataclass
+class Report:
+    files: dict  # Path -> (text, [TestBlock])
+    exact: list = field(default_factory=list)  # Groups with more than one block
+    near: list = field(default_factory=list)
+    file_seconds: dict = field(default_factory=dict)  # Path -> median seconds
+
+    def redundant(self, near=False):
+        """Redundant blocks, each once, across exact (and near) groups."""
+        seen, out = set(), []
+        for group in self.exact + (self.near if near else []):
+            for block in group.redundant:
+                if id(block) not in seen:
+                    seen.add(id(block))
+                    out.append(block)
+        return out
+
+    def cost(self, block):
+        """Estimated seconds a block costs: its line share of its file's median time."""
+        seconds = self.file_seconds.get(block.path)
+        if seconds is None:
+            return None
+        total = self.files[block.path][0].count('\n') or 1
+        return seconds * block.lines / total
+
+
+def tokens(text):
+    """(kind, value) pairs with comments and whitespace removed."""
+    out = []
+    for m in TOKEN.finditer(text):
+        kind = m.lastgroup
+        if kind not in ('comment', 'space'):
+            out.append((kind, m.group()))
+    return out
+
+
+def _block_end(text, pos):
+    """Offset just past the brace closing the block whose `{` comes first after `pos`."""
+    depth = 0
+    for m in TOKEN.finditer(text, pos):
+        if m.lastgroup != 'punct':
+            continue
+        if m.group() == '{':
+            depth += 1
+        elif m.group() == '}':
+            depth -= 1
+            if depth == 0:
+                end = m.end()
+                return end + 1 if text.startswith('\n', end) else end
+    return None
+
+
+def _leading_comment(text, start):
+    """Move `start` up over the `//` lines directly above it."""
+    while start > 0:
+        prev = text.rfind('\n', 0, start - 1) + 1
+        if not text[prev:start].lstrip().startswith('//'):
+            break
+        start = prev
+    return start
+
+
+def parse_tests(path):
+    """Return (text, [TestBlock]) for one file."""
+    text = path.read_text(encoding='utf-8')
+    blocks = []
+    pos = 0
+    for m in TEST_START.finditer(text):
+        if m.start() < pos:
+            continue
+        end = _block_end(text, m.start())
+        if end is None:
+            break
+        name_match = re.match(r'test\s*"((?:\\.|[^"\\])*)"', text[m.start():end])
+        start = _leading_comment(text, m.start())
+        body = text[text.index('{', m.start()):end]
+        block = TestBlock(path, name_match.group(1) if name_match else '', start, end,
+                          text.count('\n', start, end))
+        toks = tokens(body)
+        block.exact = _digest(v for _, v in toks)
+        block.near = _digest(_near_tokens(toks))
+        blocks.append(block)
+        pos = end
+    return text, blocks
+
+
+def _digest(values):
+    return hashlib.sha1(' '.join(values).encode('utf-8')).hexdigest()
+
+
+def _near_tokens(toks):
+    names = {}
+    bind_next = False
+    for kind, value in toks:
+        if kind == 'ident':
+            if value in ('let', 'mut', 'for'):
+                bind_next = value != 'mut' or bind_next
+                yield value
+                continue
+            if bind_next and value not in names:
+                names[value] = f'_v{len(names)}'
+            bind_next = False
+            yield names.get(value, value)
+        elif kind == 'number':
+            yield _int_literal(value)
+        else:
+            if value != ',':
+                bind_next = False
+            yield value
+
+
+def _int_literal(value):
+    digits, suffix = INT_SUFFIX.match(value).groups()
+    try:
+        return f'{int(digits.replace("_", ""), 0)}{suffix or ""}'
+    except ValueError:
+        return value
+
+
+def _keeper(blocks):
+    return min(blocks, key=lambda b: (FILLER_NAME.match(b.path.name) is not None, b.path.name, b.start))
+
+
+def _groups(blocks, attr):
+    by_key = {}
+    for block in blocks:
+        by_key.setdefault(getattr(block, attr), []).append(block)
+    groups = [Group(key, members) for key, members in by_key.items() if len(members) > 1]
+    for group in groups:
+        group.keep = _keeper(group.blocks)
+    groups.sort(key=lambda g: (-len(g.blocks), g.keep.path.name, g.keep.start))
+    return groups
+
+
+def _file_seconds(paths, history):
+    seconds = {}
+    for path in paths:
+        try:
+            key = str(path.relative_to(REPO_ROOT))
+        except ValueError:
+            continue
+        values = history.series('files', key)
+        if values:
+            seconds[path] = statistics.median(values)
+    return seconds
+
+
+def analyze(package_dir, history=None):
+    """Parse every `.mbt` file of one package directory and group its tests."""
+    package_dir = Path(package_dir).resolve()
+    files = {}
+    for path in sorted(package_dir.glob('*.mbt')):
+        files[path] = parse_tests(path)
+    blocks = [b for _, file_blocks in files.values() for b in file_blocks]
+    report = Report(files, _groups(blocks, 'exact'))
+    # Near groups add something only where they merge blocks the exact pass kept
+    exact_redundant = {id(b) for g in report.exact for b in g.redundant}
+    near_candidates = [b for b in blocks if id(b) not in exact_redundant]
+    report.near = _groups(near_candidates, 'near')
+    report.file_seconds = _file_seconds(files, history or History())
+    return report
+
+
+def print_report(report, near=False, limit=20):
+    total_blocks = sum(len(blocks) for _, blocks in report.files.values())
+    total_lines = sum(b.lines for _, blocks in report.files.values() for b in blocks)
+    sections = [('exact', report.exact)] + ([('near', report.near)] if near else [])
+    for label, groups in sections:
+        print(f'{label} duplicates: {len(groups)} groups, '
+              f'{sum(len(g.redundant) for g in groups)} redundant tests')
+        for group in groups[:limit]:
+            print(f'  keep {group.keep.path.name}: "{group.keep.name}"')
+            for block in group.redundant:
+                print(f'    drop {block.path.name}: "{block.name}" ({block.lines} lines)')
+        if len(groups) > limit:
+            print(f'  ... {len(groups) - limit} more groups')
+    redundant = report.redundant(near)
+    lines = sum(b.lines for b in redundant)
+    costs = [report.cost(b) for b in redundant]
+    timed = [c for c in costs if c is not None]
+    print(f'{len(redundant)} of {total_blocks} tests are redundant: '
+          f'{lines} of {total_lines} test lines ({100 * lines / max(total_lines, 1):.1f}%)')
+    if timed:
+        untimed = len(costs) - len(timed)
+        note = f', {untimed} in files with no timing history' if untimed else ''
+        print(f'estimated cost: {sum(timed):.2f}s of compile and run time per full run{note}')
+    else:
+        print('no timing history for these files; run `python3 -m harness test` to record some')
+
+
+def emit(report, out_dir, near=False):
+    """Write the package with redundant blocks removed; return the files written."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    drop = {id(b) for b in report.redundant(near)}
+    written = []
+    for path, (text, blocks) in report.files.items():
+        parts, pos = [], 0
+        for block in blocks:
+            if id(block) in drop:
+                parts.append(text[pos:block.start])
+                pos = block.end
+        parts.append(text[pos:])
+        result = re.sub(r'\n{3,}', '\n\n', ''.join(parts))
+        if not tokens(result):
+            continue  # nothing but comments left
+        (out_dir / path.name).write_text(result, encoding='utf-8')
+        written.append(out_dir / path.name)
+    package_dir = next(iter(report.files)).parent if report.files else None
+    for extra in ('moon.pkg.json', 'pkg.generated.mbti'):
+        if package_dir is not None and (package_dir / extra).exists():
+            (out_dir / extra).write_text((package_dir / extra).read_text(encoding='utf-8'),
+                                         encoding='utf-8')
+    return written
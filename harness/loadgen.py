@@ -0,0 +1,135 @@
+"""Load driver for an OTLP/HTTP trace endpoint.
+
+Each connection is a keep-alive HTTP/1.1 client that posts pre-encoded
+ExportTraceServiceRequest batches for a fixed duration, the way an exporter
+with that many concurrent exports would. 429 and 503 replies are retried after
+`Retry-After` (capped), partial_success replies are counted but not retried,
+as the OTLP spec requires. The result is the sustained rate of accepted spans
+and the latency distribution of successful exports.
+
+Point it at `harness collector` for an offline baseline, or at a real
+collector to compare.
+"""
+import asyncio
+import gzip
+import os
+import statistics
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from . import otlp_proto
+
+MAX_BACKOFF = 5.0
+
+
+@dataclass
+class LoadResult:
+    seconds: float = 0.0
+    requests: int = 0
+    spans_sent: int = 0
+    spans_accepted: int = 0
+    spans_rejected: int = 0
+    throttled: int = 0  # 429/503 replies
+    errors: int = 0
+    latencies: list = field(default_factory=list)
+
+    def summary(self):
+        lat = sorted(self.latencies)
+
+        def pct(p):
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 3) if lat else None
+
+        return {
+            'seconds': round(self.seconds, 3),
+            'requests': self.requests,
+            'spans_sent': self.spans_sent,
+            'spans_accepted': self.spans_accepted,
+            'spans_rejected': self.spans_rejected,
+            'throttled': self.throttled,
+            'errors': self.errors,
+            'spans_per_second': round(self.spans_accepted / self.seconds, 1) if self.seconds else 0.0,
+            'latency_ms': {'p50': pct(0.50), 'p99': pct(0.99),
+                           'mean': round(statistics.mean(lat) * 1000, 3) if lat else None},
+        }
+
+
+def make_batch(batch_size, seq):
+    """One encoded request with `batch_size` spans; ids are random, names repeat."""
+    now = time.time_ns()
+    spans = [otlp_proto.encode_span(os.urandom(16), os.urandom(8), f'op-{(seq + i) % 16}',
+                                    now - 1_000_000, now)
+             for i in range(batch_size)]
+    return otlp_proto.encode_request(spans)
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', '0') or 0)
+    body = await reader.readexactly(length) if length else b''
+    return status, headers, body
+
+
+async def _connection(host, port, path, bodies, batch_size, use_gzip, deadline, result):
+    reader, writer = await asyncio.open_connection(host, port)
+    extra = 'Content-Encoding: gzip\r\n' if use_gzip else ''
+    i = 0
+    try:
+        while time.monotonic() < deadline:
+            body = bodies[i % len(bodies)]
+            i += 1
+            head = (f'POST {path} HTTP/1.1\r\nHost: {host}:{port}\r\n'
+                    f'Content-Type: application/x-protobuf\r\n{extra}'
+                    f'Content-Length: {len(body)}\r\n\r\n').encode('latin-1')
+            start = time.monotonic()
+            writer.write(head + body)
+            await writer.drain()
+            status, headers, reply = await _read_response(reader)
+            result.requests += 1
+            result.spans_sent += batch_size
+            if status == 200:
+                result.latencies.append(time.monotonic() - start)
+                rejected, _ = otlp_proto.decode_partial_success(reply) if reply else (0, '')
+                result.spans_rejected += rejected
+                result.spans_accepted += batch_size - rejected
+            elif status in (429, 503):
+                result.throttled += 1
+                try:
+                    backoff = float(headers.get('retry-after', '1'))
+                except ValueError:
+                    backoff = 1.0
+                await asyncio.sleep(min(backoff, MAX_BACKOFF, max(0.0, deadline - time.monotonic())))
+            else:
+                result.errors += 1
+    finally:
+        writer.close()
+
+
+async def drive(url='http://127.0.0.1:4318/v1/traces', connections=8, batch_size=512,
+                duration=10.0, use_gzip=False, distinct_batches=8):
+    """Post batches over `connections` for `duration` seconds and return a LoadResult."""
+    parts = urlsplit(url)
+    host, port, path = parts.hostname, parts.port or 80, parts.path or '/v1/traces'
+    bodies = [make_batch(batch_size, n) for n in range(distinct_batches)]
+    if use_gzip:
+        bodies = [gzip.compress(b, compresslevel=1) for b in bodies]
+    result = LoadResult()
+    start = time.monotonic()
+    deadline = start + duration
+    outcomes = await asyncio.gather(
+        *(_connection(host, port, path, bodies, batch_size, use_gzip, deadline, result)
+          for _ in range(connections)),
+        return_exceptions=True)
+    result.errors += sum(1 for o in outcomes if isinstance(o, Exception))
+    result.seconds = time.monotonic() - start
+    return result
@@ -0,0 +1,135 @@
+"""Cross-backend test matrix.
+
+Each backend is built and tested by its own worker process in its own
+`--target-dir` under `.harness/matrix/<backend>/`, so moon's incremental build
+reuses that backend's artifacts from the previous run. When nothing the tests
+can observe has changed since a backend last passed (same tree fingerprint as
+used by `--changed` selection), its cached result is reported without running
+moon at all.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .packages import SKIP_DIRS, iter_test_files, load_packages
+from .selection import Fingerprints, HashIndex
+from .stream import run_streaming
+from .toolchain import REPO_ROOT, find_moon, setup_environment, state_path
+
+BACKENDS = ('wasm-gc', 'wasm', 'js', 'native', 'llvm')
+DEFAULT_BACKENDS = ('wasm-gc', 'native', 'js', 'wasm')
+# moon.mod.json, package configs and virtual package interfaces
+BUILD_CONFIG = ('moon.mod.json', 'moon.pkg.json', 'pkg.mbti')
+
+
+def tree_fingerprint(packages=None):
+    """Hash of every package fingerprint and test file in the module.
+
+    Build configuration is hashed as well, found by walking the tree rather
+    than through the package list: `moon.mod.json`, every `moon.pkg.json`
+    (targets, native stubs, imports), virtual package interfaces and every
+    native stub source. Any of them can change a backend's result without
+    touching a `.mbt` file.
+    """
+    packages = packages if packages is not None else load_packages()
+    index = HashIndex()
+    prints = Fingerprints(packages, index)
+    h = hashlib.sha256()
+    for tf in iter_test_files(packages):
+        h.update(tf.key.encode() + b'\0' + prints.test_file(tf).encode())
+    for pkg in packages:
+        h.update(pkg.name.encode() + b'\0' + prints.package(pkg.name).encode())
+    for path in _build_config_files():
+        h.update(str(path.relative_to(REPO_ROOT)).encode() + b'\0' + index.digest(path).encode())
+    index.save()
+    return h.hexdigest()
+
+
+def _build_config_files(root=None):
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root or REPO_ROOT):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS and not d.startswith('.'))
+        directory = Path(dirpath)
+        for name in sorted(filenames):
+            if name in BUILD_CONFIG or name.endswith(('.c', '.h')):
+                files.append(directory / name)
+    return files
+
+
+def run_backend(target, timeout):
+    env = setup_environment()
+    moon = find_moon(env) or 'moon'
+    log_path = state_path('matrix', target, 'moon.log')
+    cmd = [moon, 'test', '--target', target,
+           '--target-dir', str(state_path('matrix', target, 'target'))]
+    with open(log_path, 'w', encoding='utf-8') as log:
+        outcome = run_streaming(cmd, cwd=REPO_ROOT, env=env, log_file=log, timeout=timeout)
+    summary = outcome.parser.summary
+    status = 'timeout' if outcome.timed_out else ('failed' if outcome.failed else 'passed')
+    return {
+        'backend': target,
+        'status': status,
+        'exit_code': outcome.exit_code,
+        'total': summary.total if summary else 0,
+        'passed': summary.passed if summary else 0,
+        'failed': summary.failed if summary else 0,
+        'failed_tests': [f.key for f in outcome.parser.failures],
+        'build_errors': outcome.parser.build_errors[:10],
+        'seconds': outcome.seconds,
+        'log': str(log_path),
+        'cached': False,
+    }
+
+
+def _cache_path():
+    return state_path('matrix', 'results.json')
+
+
+def _load_cache():
+    try:
+        with open(_cache_path(), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def run(backends=DEFAULT_BACKENDS, jobs=None, timeout=1800, force=False):
+    """Test every backend in parallel and return one result row per backend."""
+    fingerprint = tree_fingerprint()
+    cache = _load_cache()
+    rows, todo = {}, []
+    for target in backends:
+        entry = cache.get(target)
+        if not force and entry and entry['fingerprint'] == fingerprint and entry['result']['status'] == 'passed':
+            rows[target] = dict(entry['result'], cached=True)
+        else:
+            todo.append(target)
+    if todo:
+        with ProcessPoolExecutor(max_workers=jobs or len(todo)) as pool:
+            for target, result in zip(todo, pool.map(run_backend, todo, [timeout] * len(todo))):
+                rows[target] = result
+                cache[target] = {'fingerprint': fingerprint, 'result': result}
+        with open(_cache_path(), 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+    return [rows[t] for t in backends]
+
+
+def print_table(rows):
+    print(f"{'backend':<9} {'status':<8} {'total':>6} {'passed':>7} {'failed':>7} {'seconds':>8}")
+    for row in rows:
+        seconds = 'cached' if row['cached'] else f"{row['seconds']:.1f}"
+        print(f"{row['backend']:<9} {row['status']:<8} {row['total']:>6} {row['passed']:>7} "
+              f"{row['failed']:>7} {seconds:>8}")
+    for row in rows:
+        for key in row['failed_tests'][:20]:
+            print(f"  [{row['backend']}] {key}")
+        for line in row['build_errors']:
+            print(f"  [{row['backend']}] {line}")
+
+
+def exit_code(rows):
+    if any(r['status'] == 'timeout' for r in rows):
+        return 2
+    return 0 if all(r['status'] == 'passed' for r in rows) else 1
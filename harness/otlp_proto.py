@@ -0,0 +1,166 @@
+"""Just enough protobuf to read and write OTLP trace export messages.
+
+Only the fields the collector stand-in and the load driver need are known
+here; everything else is skipped by wire type, so newer OTLP messages still
+decode. Field numbers follow opentelemetry-proto:
+
+    ExportTraceServiceRequest  resource_spans = 1
+    ResourceSpans              resource = 1, scope_spans = 2
+    ScopeSpans                 scope = 1, spans = 2
+    Span                       trace_id = 1, span_id = 2, parent_span_id = 4,
+                               name = 5, kind = 6, start/end_time_unix_nano = 7/8
+    ExportTraceServiceResponse partial_success = 1
+    ExportTracePartialSuccess  rejected_spans = 1, error_message = 2
+"""
+import struct
+
+VARINT, FIXED64, LENGTH, FIXED32 = 0, 1, 2, 5
+
+
+class DecodeError(ValueError):
+    pass
+
+
+def read_varint(buf, pos):
+    result = shift = 0
+    while True:
+        if pos >= len(buf):
+            raise DecodeError('truncated varint')
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+        if shift >= 64:
+            raise DecodeError('varint too long')
+
+
+def iter_fields(buf, start=0, end=None):
+    """Yield (field number, wire type, value) over one message.
+
+    Length-delimited values are (start, end) offsets into `buf`, so nested
+    messages are walked without copying.
+    """
+    pos = start
+    end = len(buf) if end is None else end
+    while pos < end:
+        key, pos = read_varint(buf, pos)
+        field, wire = key >> 3, key & 7
+        if wire == VARINT:
+            value, pos = read_varint(buf, pos)
+        elif wire == FIXED64:
+            value, pos = pos, pos + 8
+        elif wire == LENGTH:
+            size, pos = read_varint(buf, pos)
+            value = (pos, pos + size)
+            pos += size
+        elif wire == FIXED32:
+            value, pos = pos, pos + 4
+        else:
+            raise DecodeError(f'unsupported wire type {wire}')
+        if pos > end:
+            raise DecodeError('field runs past the end of its message')
+        yield field, wire, value
+
+
+def _children(buf, span, number):
+    for field, wire, value in iter_fields(buf, *span):
+        if field == number and wire == LENGTH:
+            yield value
+
+
+def summarize_request(buf):
+    """Walk an ExportTraceServiceRequest and return (batches, spans, invalid_spans).
+
+    A batch is one ScopeSpans; a span is invalid when its trace or span id
+    has the wrong length.
+    """
+    buf = memoryview(buf)
+    batches = spans = invalid = 0
+    for resource_spans in _children(buf, (0, len(buf)), 1):
+        for scope_spans in _children(buf, resource_spans, 2):
+            batches += 1
+            for span in _children(buf, scope_spans, 2):
+                spans += 1
+                ids = {1: 0, 2: 0}
+                for field, wire, value in iter_fields(buf, *span):
+                    if field in ids and wire == LENGTH:
+                        ids[field] = value[1] - value[0]
+                if ids[1] != 16 or ids[2] != 8:
+                    invalid += 1
+    return batches, spans, invalid
+
+
+# Writing
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def write_key(out, field, wire):
+    write_varint(out, (field << 3) | wire)
+
+
+def write_bytes(out, field, data):
+    write_key(out, field, LENGTH)
+    write_varint(out, len(data))
+    out += data
+
+
+def write_fixed64(out, field, value):
+    write_key(out, field, FIXED64)
+    out += struct.pack('<Q', value)
+
+
+def encode_span(trace_id, span_id, name, start_ns, end_ns, kind=1):
+    out = bytearray()
+    write_bytes(out, 1, trace_id)
+    write_bytes(out, 2, span_id)
+    write_bytes(out, 5, name.encode('utf-8'))
+    write_key(out, 6, VARINT)
+    write_varint(out, kind)
+    write_fixed64(out, 7, start_ns)
+    write_fixed64(out, 8, end_ns)
+    return bytes(out)
+
+
+def encode_request(spans, scope_name='loadgen'):
+    """ExportTraceServiceRequest with one resource and one scope holding `spans`."""
+    scope = bytearray()
+    write_bytes(scope, 1, scope_name.encode('utf-8'))
+    scope_spans = bytearray()
+    write_bytes(scope_spans, 1, scope)
+    for span in spans:
+        write_bytes(scope_spans, 2, span)
+    resource_spans = bytearray()
+    write_bytes(resource_spans, 2, scope_spans)
+    request = bytearray()
+    write_bytes(request, 1, resource_spans)
+    return bytes(request)
+
+
+def encode_partial_success(rejected_spans, message):
+    partial = bytearray()
+    write_key(partial, 1, VARINT)
+    write_varint(partial, rejected_spans)
+    write_bytes(partial, 2, message.encode('utf-8'))
+    response = bytearray()
+    write_bytes(response, 1, partial)
+    return bytes(response)
+
+
+def decode_partial_success(buf):
+    """Return (rejected_spans, error_message) from an ExportTraceServiceResponse."""
+    buf = memoryview(buf)
+    rejected, message = 0, ''
+    for partial in _children(buf, (0, len(buf)), 1):
+        for field, wire, value in iter_fields(buf, *partial):
+            if field == 1 and wire == VARINT:
+                rejected = value
+            elif field == 2 and wire == LENGTH:
+                message = bytes(buf[value[0]:value[1]]).decode('utf-8', 'replace')
+    return rejected, message
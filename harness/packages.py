@@ -0,0 +1,111 @@
+"""Package and test-file discovery.
+
+`_build/packages.json` is the primary source. It records absolute paths from
+the machine that produced it and lags behind new files, so paths are re-rooted
+on this checkout and each package directory is also scanned for `.mbt` files
+that contain test blocks. Packages added since the manifest was written are
+picked up from their `moon.pkg.json`.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .toolchain import REPO_ROOT
+
+SKIP_DIRS = {'.git', '_build', 'target', '.harness', 'node_modules', '__pycache__'}
+TEST_BLOCK = re.compile(rb'^test\b', re.M)
+
+
+@dataclass
+class Package:
+    name: str
+    rel: str
+    path: Path
+    test_files: list = field(default_factory=list)
+
+
+@dataclass
+class TestFile:
+    package: Package
+    path: Path
+
+    @property
+    def name(self):
+        return self.path.name
+
+    @property
+    def key(self):
+        """Stable identifier used in reports and caches: `<rel>/<file>`."""
+        return f'{self.package.rel}/{self.path.name}' if self.package.rel else self.path.name
+
+
+def module_name(root=REPO_ROOT):
+    with open(root / 'moon.mod.json', encoding='utf-8') as f:
+        return json.load(f)['name']
+
+
+def has_tests(path):
+    try:
+        return TEST_BLOCK.search(path.read_bytes()) is not None
+    except OSError:
+        return False
+
+
+def _scan_test_files(pkg_dir):
+    return sorted(p for p in pkg_dir.glob('*.mbt') if has_tests(p))
+
+
+def _from_manifest(root):
+    manifest = root / '_build' / 'packages.json'
+    if not manifest.exists():
+        return []
+    with open(manifest, encoding='utf-8') as f:
+        data = json.load(f)
+    packages = []
+    for entry in data.get('packages', []):
+        if entry.get('is-third-party'):
+            continue
+        rel = entry.get('rel', '')
+        name = f"{entry['root']}/{rel}" if rel else entry['root']
+        pkg_dir = root / rel
+        if not pkg_dir.is_dir():
+            continue
+        listed = set()
+        for key in ('test-files', 'wbtest-files', 'files'):
+            for original in entry.get(key, {}):
+                candidate = pkg_dir / Path(original).name
+                if candidate.exists() and has_tests(candidate):
+                    listed.add(candidate)
+        listed.update(_scan_test_files(pkg_dir))
+        packages.append(Package(name, rel, pkg_dir, sorted(listed)))
+    return packages
+
+
+def _from_tree(root, known):
+    mod = module_name(root)
+    packages = []
+    for pkg_json in sorted(root.rglob('moon.pkg.json')):
+        pkg_dir = pkg_json.parent
+        rel_parts = pkg_dir.relative_to(root).parts
+        if any(part in SKIP_DIRS for part in rel_parts):
+            continue
+        rel = '/'.join(rel_parts)
+        if rel in known:
+            continue
+        name = f'{mod}/{rel}' if rel else mod
+        packages.append(Package(name, rel, pkg_dir, _scan_test_files(pkg_dir)))
+    return packages
+
+
+def load_packages(root=REPO_ROOT):
+    """Return every local package with its test files."""
+    packages = _from_manifest(root)
+    packages.extend(_from_tree(root, {p.rel for p in packages}))
+    return sorted(packages, key=lambda p: p.rel)
+
+
+def iter_test_files(packages):
+    for pkg in packages:
+        for path in pkg.test_files:
+            yield TestFile(pkg, path)
@@ -0,0 +1,226 @@
+"""Asyncio orchestration for the task scripts.
+
+The root-level task scripts all follow the same flow: make sure moon is
+installed, run `moon test`, then take branch A (failures: fix and run the
+path guard) or branch B (green: run the path guard, add tests, commit). This
+module is that flow in one place.
+
+Steps are subprocesses started with asyncio, so independent steps run at the
+same time, each in its own process group with its own timeout; a step that
+times out is killed together with everything it started. Output is streamed
+line by line to a per-step log file and, for test steps, through
+`OutputParser`; nothing is accumulated in memory beyond the parser's bounded
+context. A line longer than LINE_LIMIT is logged in full but reaches the
+parser and the tail truncated.
+"""
+import asyncio
+import codecs
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .stream import OutputParser, kill_group
+from .toolchain import REPO_ROOT, find_moon, setup_environment, state_path
+
+INSTALL_COMMAND = 'curl -fsSL https://cli.moonbitlang.com/install/unix.sh | bash'
+GUARD = ['python3', 'scripts/guard_bad_paths.py']
+LINE_LIMIT = 1 << 20
+
+
+def log(message, log_file=None):
+    """Print a timestamped line, also appending it to `log_file` if given."""
+    line = f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}"
+    print(line, flush=True)
+    if log_file is not None:
+        with open(log_file, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+@dataclass
+class Step:
+    name: str
+    cmd: object  # argv list, or a string run through the shell
+    timeout: float = 180
+    cwd: Path = REPO_ROOT
+    log_path: Path = None
+    parse: bool = False  # feed the output to OutputParser
+    on_result: object = None
+
+
+@dataclass
+class StepResult:
+    name: str
+    exit_code: int  # None when the step timed out
+    seconds: float
+    log_path: Path
+    parser: OutputParser = None
+    tail: list = field(default_factory=list)  # last few output lines
+
+    @property
+    def timed_out(self):
+        return self.exit_code is None
+
+    @property
+    def ok(self):
+        return self.exit_code == 0
+
+    @property
+    def output(self):
+        return '\n'.join(self.tail)
+
+
+async def run_step(step, env=None):
+    """Run one step, streaming its combined output to its log file."""
+    env = env or setup_environment()
+    log_path = step.log_path or state_path('pipeline', f'{step.name}.log')
+    parser = OutputParser(on_result=step.on_result) if step.parse else None
+    tail = []
+    start = time.monotonic()
+    kwargs = dict(cwd=step.cwd, env=env, stdout=asyncio.subprocess.PIPE,
+                  stderr=asyncio.subprocess.STDOUT, limit=LINE_LIMIT,
+                  start_new_session=True)
+    try:
+        if isinstance(step.cmd, str):
+            proc = await asyncio.create_subprocess_shell(step.cmd, **kwargs)
+        else:
+            proc = await asyncio.create_subprocess_exec(*step.cmd, **kwargs)
+    except OSError as e:
+        with open(log_path, 'w', encoding='utf-8') as log_file:
+            log_file.write(f'{e}\n')
+        return StepResult(step.name, 127, 0.0, log_path, parser, [str(e)])
+
+    async def pump(log_file):
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        head, kept = [], 0  # start of the current line, at most LINE_LIMIT characters
+        async for piece, ends_line in _pieces(proc.stdout):
+            text = decoder.decode(piece)
+            log_file.write(text)
+            if kept < LINE_LIMIT:
+                head.append(text[:LINE_LIMIT - kept])
+                kept += len(head[-1])
+            if ends_line:
+                line = ''.join(head)
+                head, kept = [], 0
+                if parser is not None:
+                    parser.feed(line)
+                tail.append(line.rstrip('\n'))
+                del tail[:-20]
+        log_file.write(decoder.decode(b'', final=True))
+        return await proc.wait()
+
+    with open(log_path, 'w', encoding='utf-8') as log_file:
+        try:
+            code = await asyncio.wait_for(pump(log_file), step.timeout)
+        except asyncio.TimeoutError:
+            # The step's children (moon's test runners, the install shell's
+            # pipeline) share its process group; kill them all
+            kill_group(proc)
+            await proc.wait()
+            code = None
+        except BaseException:
+            kill_group(proc)
+            raise
+    if parser is not None:
+        parser.finish()
+    return StepResult(step.name, code, round(time.monotonic() - start, 3), log_path, parser, tail)
+
+
+async def _pieces(stream):
+    """Yield (bytes, ends_line) pieces of a stream, none longer than its limit.
+
+    readline() raises ValueError on a line longer than the limit (and drops
+    it); reading up to the newline or the limit, whichever comes first, keeps
+    such a line as several pieces instead of aborting the step.
+    """
+    while True:
+        try:
+            yield await stream.readuntil(b'\n'), True
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                yield e.partial, True
+            return
+        except asyncio.LimitOverrunError as e:
+            yield await stream.readexactly(e.consumed), False
+
+
+async def run_steps(steps, env=None):
+    """Run steps concurrently; results come back in the order given."""
+    env = env or setup_environment()
+    return await asyncio.gather(*(run_step(step, env) for step in steps))
+
+
+async def ensure_moon(env=None, timeout=60):
+    """Return the moon path, installing the toolchain first if it is missing."""
+    env = env or setup_environment()
+    moon = find_moon(env)
+    if moon is None:
+        await run_step(Step('install', INSTALL_COMMAND, timeout=timeout), env)
+        moon = find_moon(env)
+    return moon
+
+
+@dataclass
+class Decision:
+    branch: str  # 'A' (something failed) or 'B' (green)
+    reasons: list
+
+    @property
+    def failed(self):
+        return self.branch == 'A'
+
+
+def decide(result):
+    """Branch A if the test step failed, timed out or did not build, else branch B.
+
+    The decision is made on parsed records and the exit code, never by
+    searching the log for words like "error".
+    """
+    reasons = []
+    parser = result.parser
+    if result.timed_out:
+        reasons.append('timeout')
+    elif result.exit_code != 0:
+        reasons.append(f'exit code {result.exit_code}')
+    if parser is not None:
+        reasons.extend(f'{r.status}: {r.key}' for r in parser.failures)
+        reasons.extend(f'build error: {line}' for line in parser.build_errors)
+        if parser.summary is not None and parser.summary.failed and not parser.failures:
+            reasons.append(f'{parser.summary.failed} failed')
+    return Decision('A' if reasons else 'B', reasons)
+
+
+@dataclass
+class TaskOutcome:
+    moon: str
+    version: str
+    test: StepResult
+    decision: Decision
+    guard: StepResult = None  # the fixing guard run, branch B only
+
+
+async def run_task(project_dir=REPO_ROOT, test_log=None, timeout=180, on_result=None,
+                   guard=True):
+    """The task flow: toolchain, then tests; branch B runs the path guard.
+
+    The guard only runs once the tests are known to pass (never concurrently
+    with `moon test`, which reads the files it may rewrite). Scripts that only
+    report the branch pass guard=False.
+    """
+    env = setup_environment()
+    moon = await ensure_moon(env)
+    if moon is None:
+        return None
+    version, test = await run_steps([
+        Step('version', [moon, '--version'], timeout=30, cwd=project_dir),
+        Step('test', [moon, 'test'], timeout=timeout, cwd=project_dir, log_path=test_log,
+             parse=True, on_result=on_result),
+    ], env)
+    outcome = TaskOutcome(moon, version.output.strip(), test, decide(test))
+    if guard and not outcome.decision.failed:
+        outcome.guard = await run_step(Step('guard', GUARD, cwd=project_dir), env)
+    return outcome
+
+
+def run(coro):
+    """Entry point for synchronous scripts."""
+    return asyncio.run(coro)
@@ -0,0 +1,158 @@
+"""Sharded `moon test` runner.
+
+Test files are spread over shards balanced by weight (file size until timing
+history is available) and each shard runs in its own worker process with its
+own `--target-dir`, so shards do not contend for moon's build lock. Every
+shard has its own timeout; moon's output is parsed as it streams and written
+straight to a log file.
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import timings
+from .packages import iter_test_files, load_packages
+from .stream import run_streaming
+from .toolchain import REPO_ROOT, find_moon, setup_environment, state_path
+
+
+def plan_shards(test_files, shards, weight=None):
+    """Split test files into `shards` lists of roughly equal total weight.
+
+    `weight` defaults to the file size; `run` passes recorded durations.
+    """
+    weight = weight or (lambda tf: tf.path.stat().st_size)
+    buckets = [[] for _ in range(max(1, shards))]
+    loads = [0] * len(buckets)
+    for tf in sorted(test_files, key=weight, reverse=True):
+        i = loads.index(min(loads))
+        buckets[i].append(tf)
+        loads[i] += weight(tf)
+    return [b for b in buckets if b]
+
+
+def _file_result(key, outcome):
+    if outcome is None:
+        return {'file': key, 'status': 'timeout', 'exit_code': None, 'total': 0, 'passed': 0,
+                'failed': 0, 'failed_tests': [], 'tests': [], 'build_errors': [], 'seconds': 0.0}
+    parser = outcome.parser
+    summary = parser.summary
+    total, passed, failed = (summary.total, summary.passed, summary.failed) if summary else (0, 0, 0)
+    status = 'failed' if outcome.failed else 'passed'
+    if outcome.timed_out:
+        status = 'timeout'
+    return {
+        'file': key,
+        'status': status,
+        'exit_code': outcome.exit_code,
+        'total': total,
+        'passed': passed,
+        'failed': failed,
+        'failed_tests': [{'name': r.name, 'status': r.status, 'message': r.message,
+                          'context': r.context} for r in parser.failures],
+        'tests': [{'name': r.name, 'status': r.status, 'seconds': r.seconds} for r in parser.results],
+        'build_errors': parser.build_errors,
+        'seconds': outcome.seconds,
+    }
+
+
+def _print_failure(result):
+    if result.status != 'ok':
+        print(f'{result.status.upper()} {result.key}: {result.message}', flush=True)
+
+
+def run_shard(index, items, timeout, extra_args=(), on_result=None, env=None, moon=None):
+    """Run one shard's files sequentially. `items` are (package, rel_path, key).
+
+    Failures are reported through `on_result` as soon as moon prints them.
+    `env` and `moon` skip toolchain discovery when the caller already did it.
+    """
+    on_result = on_result or _print_failure
+    env = env or setup_environment()
+    moon = moon or find_moon(env) or 'moon'
+    target_dir = state_path('shards', str(index), 'target')
+    log_path = state_path('shards', str(index), 'moon.log')
+    deadline = time.monotonic() + timeout
+    results = []
+    with open(log_path, 'w', encoding='utf-8') as log:
+        for package, rel_path, key in items:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                results.append(_file_result(key, None))
+                continue
+            cmd = [moon, 'test', '-p', package, '-f', os.path.basename(rel_path),
+                   '--target-dir', str(target_dir), *extra_args]
+            log.write(f"$ {' '.join(cmd)}\n")
+            outcome = run_streaming(cmd, cwd=REPO_ROOT, env=env, log_file=log,
+                                    timeout=remaining, on_result=on_result)
+            results.append(_file_result(key, outcome))
+    return {'shard': index, 'log': str(log_path), 'files': results}
+
+
+def merge(shard_reports):
+    files = sorted((r for shard in shard_reports for r in shard['files']), key=lambda r: r['file'])
+    return {
+        'shards': len(shard_reports),
+        'files': len(files),
+        'total': sum(r['total'] for r in files),
+        'passed': sum(r['passed'] for r in files),
+        'failed': sum(r['failed'] for r in files),
+        'timeouts': [r['file'] for r in files if r['status'] == 'timeout'],
+        'failed_files': [r['file'] for r in files if r['status'] == 'failed'],
+        'results': files,
+        'logs': [shard['log'] for shard in shard_reports],
+    }
+
+
+def run(jobs=None, timeout=600, test_files=None, extra_args=(), pool=None, env=None, moon=None):
+    """Run the suite sharded over `jobs` worker processes and merge the results.
+
+    A long-lived caller (the daemon) passes its own `pool` and resolved
+    toolchain; otherwise a pool is created for this run only.
+    """
+    if test_files is None:
+        test_files = list(iter_test_files(load_packages()))
+    jobs = jobs or os.cpu_count() or 1
+    history = timings.History()
+    shards = plan_shards(test_files, jobs, history.weight_function(test_files))
+
+    def submit(executor):
+        futures = [
+            executor.submit(run_shard, i,
+                            [(tf.package.name, str(tf.path.relative_to(REPO_ROOT)), tf.key) for tf in shard],
+                            timeout, tuple(extra_args), None, env, moon)
+            for i, shard in enumerate(shards)
+        ]
+        return [f.result() for f in futures]
+
+    if pool is not None:
+        reports = submit(pool)
+    else:
+        with ProcessPoolExecutor(max_workers=len(shards) or 1) as executor:
+            reports = submit(executor)
+    report = merge(reports)
+    history.record(report)
+    return report
+
+
+def print_report(report):
+    print(f"Shards: {report['shards']}  Files: {report['files']}")
+    print(f"Total tests: {report['total']}, passed: {report['passed']}, failed: {report['failed']}.")
+    for key in report['failed_files']:
+        print(f'FAILED  {key}')
+    for key in report['timeouts']:
+        print(f'TIMEOUT {key}')
+
+
+def exit_code(report):
+    if report['timeouts']:
+        return 2
+    return 1 if report['failed_files'] else 0
+
+
+def write_report(report, path=None):
+    path = path or state_path('report.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return path
@@ -0,0 +1,85 @@
+"""Read segment files written by the MoonBit file exporter (exporter/file).
+
+Layout: a 9-byte header ("OTLPSEG", version, format), then either
+length-prefixed protobuf ExportTraceServiceRequest records (u32 little-endian
+length) or one OTLP/JSON request per line. Segments may still be preallocated
+to full size, so reading stops at the first zero length or NUL byte.
+
+Files are memory-mapped and records are yielded as memoryview slices, so
+large segments stream without being copied.
+"""
+import json
+import mmap
+import struct
+
+from . import otlp_proto
+from .collector import summarize_json
+
+MAGIC = b'OTLPSEG'
+HEADER_LEN = 9
+PROTOBUF, JSON_LINES = 0, 1
+FORMATS = {PROTOBUF: 'protobuf', JSON_LINES: 'json'}
+
+
+class SegmentError(ValueError):
+    pass
+
+
+def iter_records(buf):
+    """Yield (format, record) over one segment; `buf` is bytes or an mmap."""
+    header = bytes(buf[:HEADER_LEN])
+    if len(header) < HEADER_LEN or header[:7] != MAGIC:
+        raise SegmentError('not an OTLP segment')
+    version, fmt = header[7], header[8]
+    if version != 1 or fmt not in FORMATS:
+        raise SegmentError(f'unsupported segment version {version} / format {fmt}')
+    view = memoryview(buf)
+    try:
+        pos = HEADER_LEN
+        end = len(view)
+        while pos < end:
+            if fmt == PROTOBUF:
+                if pos + 4 > end:
+                    break
+                (length,) = struct.unpack_from('<I', view, pos)
+                if length == 0:
+                    break
+                if pos + 4 + length > end:
+                    raise SegmentError(f'record at offset {pos} runs past the end of the segment')
+                yield fmt, view[pos + 4:pos + 4 + length]
+                pos += 4 + length
+            else:
+                if view[pos] == 0:
+                    break
+                newline = buf.find(b'\n', pos, end)
+                if newline < 0:
+                    raise SegmentError(f'unterminated JSON record at offset {pos}')
+                yield fmt, view[pos:newline]
+                pos = newline + 1
+    finally:
+        view.release()
+
+
+def summarize_record(fmt, record):
+    """Return (batches, spans) for one record."""
+    if fmt == PROTOBUF:
+        batches, spans, _ = otlp_proto.summarize_request(record)
+        return batches, spans
+    batches, spans, _ = summarize_json(json.loads(bytes(record)))
+    return batches, spans
+
+
+def read_segment(path):
+    """Return {'path', 'format', 'records', 'batches', 'spans', 'bytes'} for one file."""
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            summary = {'path': str(path), 'format': FORMATS.get(mm[8]) if len(mm) > 8 else None,
+                       'records': 0, 'batches': 0, 'spans': 0, 'bytes': 0}
+            for fmt, record in iter_records(mm):
+                batches, spans = summarize_record(fmt, record)
+                summary['records'] += 1
+                summary['batches'] += batches
+                summary['spans'] += spans
+                summary['bytes'] += len(record)
+                record.release()
+            return summary
@@ -0,0 +1,171 @@
+"""Incremental test selection from content hashes.
+
+Every test file gets a fingerprint: the hash of its own content, of the
+package's shared sources (any `.mbt` file that declares top-level items, plus
+`moon.pkg.json`, native stubs and a virtual package's `pkg.mbti`), of the
+fingerprints of the packages it imports, and of `moon.mod.json`. A file is
+selected when its fingerprint differs from the one recorded with its last
+passing result, so editing a single test file reruns only that file while
+editing `api/span_context.mbt` reruns everything that can observe it.
+
+File hashes are cached by (size, mtime) in `.harness/hash_index.json`; results
+are kept per test file in `.harness/results.json`.
+"""
+import hashlib
+import json
+import re
+import time
+
+from .packages import iter_test_files, load_packages
+from .toolchain import REPO_ROOT, state_path
+
+DECLARATION = re.compile(rb'^(?:pub(?:\([a-z]+\))?\s+)?(?:priv\s+)?(?:fn|struct|enum|trait|impl|let|type|typealias|suberror)\b', re.M)
+
+
+def _load_json(path, default):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _save_json(path, data):
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    tmp.replace(path)
+
+
+class HashIndex:
+    """sha256 of file contents, recomputed only when size or mtime change."""
+
+    def __init__(self, path=None):
+        self.path = path or state_path('hash_index.json')
+        self.entries = _load_json(self.path, {})
+        self.dirty = False
+
+    def digest(self, path):
+        key = str(path.relative_to(REPO_ROOT))
+        try:
+            st = path.stat()
+        except OSError:
+            return 'missing'
+        entry = self.entries.get(key)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry['sha256']
+        data = path.read_bytes()
+        sha = hashlib.sha256(data).hexdigest()
+        self.entries[key] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': sha,
+                             'declares': DECLARATION.search(data) is not None}
+        self.dirty = True
+        return sha
+
+    def declares(self, path):
+        self.digest(path)
+        return self.entries.get(str(path.relative_to(REPO_ROOT)), {}).get('declares', True)
+
+    def save(self):
+        if self.dirty:
+            _save_json(self.path, self.entries)
+            self.dirty = False
+
+
+def _imports(pkg):
+    data = _load_json(pkg.path / 'moon.pkg.json', {})
+    for item in data.get('import', []):
+        yield item['path'] if isinstance(item, dict) else item
+
+
+def build_inputs(pkg_dir):
+    """Non-`.mbt` files of a package that change what gets built.
+
+    Native stubs (`*.c`, `*.h`) and a virtual package's `pkg.mbti`.
+    """
+    files = sorted(pkg_dir.glob('*.c')) + sorted(pkg_dir.glob('*.h'))
+    if (pkg_dir / 'pkg.mbti').exists():
+        files.append(pkg_dir / 'pkg.mbti')
+    return files
+
+
+class Fingerprints:
+    def __init__(self, packages, index):
+        self.packages = {p.name: p for p in packages}
+        self.index = index
+        self.mod = index.digest(REPO_ROOT / 'moon.mod.json')
+        self._pkg_cache = {}
+
+    def shared_files(self, pkg):
+        files = [pkg.path / 'moon.pkg.json']
+        files += [p for p in sorted(pkg.path.glob('*.mbt')) if self.index.declares(p)]
+        files += build_inputs(pkg.path)
+        return files
+
+    def package(self, name, stack=()):
+        """Fingerprint of a package's shared sources and everything it imports."""
+        if name in self._pkg_cache:
+            return self._pkg_cache[name]
+        pkg = self.packages.get(name)
+        if pkg is None or name in stack:
+            return ''
+        h = hashlib.sha256(self.mod.encode())
+        for path in self.shared_files(pkg):
+            h.update(path.name.encode() + b'\0' + self.index.digest(path).encode())
+        for dep in sorted(_imports(pkg)):
+            h.update(dep.encode() + b'\0' + self.package(dep, stack + (name,)).encode())
+        self._pkg_cache[name] = h.hexdigest()
+        return self._pkg_cache[name]
+
+    def test_file(self, tf):
+        h = hashlib.sha256(self.package(tf.package.name).encode())
+        h.update(self.index.digest(tf.path).encode())
+        return h.hexdigest()
+
+
+class ResultCache:
+    """Last known result per test file, keyed by `TestFile.key`."""
+
+    def __init__(self, path=None):
+        self.path = path or state_path('results.json')
+        self.entries = _load_json(self.path, {})
+
+    def is_fresh(self, key, fingerprint):
+        entry = self.entries.get(key)
+        return bool(entry) and entry.get('fingerprint') == fingerprint and entry.get('status') == 'passed'
+
+    def record(self, result, fingerprint):
+        entry = dict(result)
+        entry['fingerprint'] = fingerprint
+        entry['recorded_at'] = time.time()
+        self.entries[result['file']] = entry
+
+    def save(self):
+        _save_json(self.path, self.entries)
+
+
+def select(packages=None, force=False):
+    """Return (selected test files, fingerprints by key, total test file count)."""
+    packages = packages if packages is not None else load_packages()
+    index = HashIndex()
+    cache = ResultCache()
+    prints = Fingerprints(packages, index)
+    selected, fingerprints, total = [], {}, 0
+    for tf in iter_test_files(packages):
+        total += 1
+        fp = prints.test_file(tf)
+        fingerprints[tf.key] = fp
+        if force or not cache.is_fresh(tf.key, fp):
+            selected.append(tf)
+    index.save()
+    return selected, fingerprints, total
+
+
+def record(report, fingerprints):
+    """Store per-file results from a runner report alongside their fingerprints."""
+    cache = ResultCache()
+    for result in report['results']:
+        fp = fingerprints.get(result['file'])
+        if fp is not None:
+            cache.record(result, fp)
+    cache.save()
+
@@ -0,0 +1,218 @@
+"""Streaming parser for `moon test` output.
+
+The subprocess pipe is read line by line. Each line goes to the log file and
+through `OutputParser`, which recognises moon's per-test records, the final
+summary and compiler diagnostics. Only a bounded window of context is kept
+around failures, so memory does not grow with the size of the log. Text is
+never scanned for bare words like "error", which also occur in test names.
+
+Recognised records:
+    test <pkg>/<file>::<name> ok
+    test <pkg>/<file>::<name> failed: <message>
+    [<module>] test <file>:<line> ("<name>") failed: <message>
+    Total tests: N, passed: N, failed: N.
+    Error: [NNNN] ...              (compile error)
+"""
+import os
+import re
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+TEST_RECORD = re.compile(
+    r'^(?:\[[^\]]+\]\s+)?test\s+(?P<target>\S+?)'
+    r'(?:::(?P<name>.+?)|\s+\("(?P<quoted>.*)"\))?'
+    r'\s+(?P<status>ok|failed)\b:?\s*(?P<message>.*)$'
+)
+SUMMARY = re.compile(r'^Total tests: (\d+), passed: (\d+), failed: (\d+)')
+BUILD_ERROR = re.compile(r'^(?:Error: \[\d+\]|error(?:\[|: ))')
+PANIC_HINTS = ('panic', 'abort', 'RuntimeError', 'unreachable', 'RUNTIME ERROR')
+
+
+@dataclass
+class TestResult:
+    file: str
+    name: str
+    status: str  # 'ok', 'failed' or 'panic'
+    message: str = ''
+    context: list = field(default_factory=list)
+    # Time since the previous record (or process start) when this one arrived
+    seconds: float = 0.0
+
+    @property
+    def key(self):
+        return f'{self.file}::{self.name}'
+
+
+@dataclass
+class Summary:
+    total: int
+    passed: int
+    failed: int
+
+
+class OutputParser:
+    """Incremental parser; feed it lines as they arrive."""
+
+    def __init__(self, context_before=5, context_after=20, on_result=None):
+        self.before = deque(maxlen=context_before)
+        self.context_after = context_after
+        self.on_result = on_result
+        self.results = []
+        self.build_errors = []
+        self.summary = None
+        self._open = None
+        self._open_budget = 0
+        self._last_mark = time.monotonic()
+
+    def _emit(self, result):
+        self.results.append(result)
+        if self.on_result is not None:
+            self.on_result(result)
+
+    def _close_open(self):
+        if self._open is not None:
+            self._emit(self._open)
+            self._open = None
+
+    def feed(self, line):
+        line = line.rstrip('\n')
+        match = TEST_RECORD.match(line)
+        if match:
+            self._close_open()
+            target = match.group('target')
+            file = target.split(':', 1)[0].rsplit('/', 1)[-1]
+            name = match.group('name') or match.group('quoted') or target
+            status = match.group('status')
+            message = match.group('message')
+            if status == 'failed' and any(h in message for h in PANIC_HINTS):
+                status = 'panic'
+            now = time.monotonic()
+            result = TestResult(file, name, status, message, seconds=round(now - self._last_mark, 6))
+            self._last_mark = now
+            if status == 'ok':
+                self._emit(result)
+            else:
+                result.context = list(self.before)
+                self._open = result
+                self._open_budget = self.context_after
+            self.before.clear()
+            return
+        summary = SUMMARY.match(line)
+        if summary:
+            self._close_open()
+            self.summary = Summary(*(int(g) for g in summary.groups()))
+            return
+        if BUILD_ERROR.match(line):
+            self._close_open()
+            if len(self.build_errors) < 100:
+                self.build_errors.append(line)
+        if self._open is not None:
+            if self._open_budget > 0:
+                self._open.context.append(line)
+                self._open_budget -= 1
+                if self._open.status == 'failed' and any(h in line for h in PANIC_HINTS):
+                    self._open.status = 'panic'
+                return
+            self._close_open()
+        self.before.append(line)
+
+    def finish(self):
+        self._close_open()
+        return self
+
+    @property
+    def failures(self):
+        return [r for r in self.results if r.status != 'ok']
+
+
+@dataclass
+class StreamOutcome:
+    exit_code: object  # int, or None when the process was killed on timeout
+    parser: OutputParser
+    seconds: float = 0.0
+
+    @property
+    def timed_out(self):
+        return self.exit_code is None
+
+    @property
+    def failed(self):
+        return (self.exit_code != 0 or bool(self.parser.failures)
+                or bool(self.parser.build_errors)
+                or (self.parser.summary is not None and self.parser.summary.failed > 0))
+
+
+def run_streaming(cmd, cwd=None, env=None, log_file=None, timeout=None,
+                  on_result=None, on_line=None, echo=False):
+    """Run `cmd`, parsing its combined output as it is produced.
+
+    `log_file` is an open text file that receives every line; `on_result` is
+    called with each TestResult as soon as it is complete and `on_line` with
+    every raw line.
+
+    The command runs in its own process group. On timeout the whole group is
+    killed, not just `cmd`: children that inherited the pipe (moon's test
+    runners) would otherwise keep it open and the read would block until they
+    exit on their own.
+    """
+    parser = OutputParser(on_result=on_result)
+    start = time.monotonic()
+    proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, text=True,
+                            encoding='utf-8', errors='replace', bufsize=1,
+                            start_new_session=True)
+    killed = threading.Event()
+
+    def kill():
+        killed.set()
+        kill_group(proc)
+        try:
+            proc.stdout.close()
+        except (OSError, ValueError):
+            pass
+
+    timer = threading.Timer(timeout, kill) if timeout else None
+    if timer is not None:
+        timer.start()
+    try:
+        try:
+            for line in proc.stdout:
+                if log_file is not None:
+                    log_file.write(line)
+                if echo:
+                    print(line, end='')
+                if on_line is not None:
+                    on_line(line)
+                parser.feed(line)
+        except (OSError, ValueError):
+            # The pipe was closed under us by the timeout
+            if not killed.is_set():
+                raise
+        code = proc.wait()
+    except BaseException:
+        # Not in our terminal's process group any more, so Ctrl-C does not
+        # reach the children: take them down with us
+        kill_group(proc)
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+        try:
+            proc.stdout.close()
+        except (OSError, ValueError):
+            pass
+    parser.finish()
+    return StreamOutcome(None if killed.is_set() else code, parser,
+                         round(time.monotonic() - start, 3))
+
+
+def kill_group(proc):
+    """SIGKILL the process group led by `proc` (started with start_new_session)."""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
@@ -0,0 +1,38 @@
+import sys
+import time
+
+from harness import bench
+
+FAKE_MOON = '''#!{python}
+import sys, time
+print('[m/otel] bench api/x_bench_test.mbt:1 ("fast") ok', flush=True)
+print('time (mean ± σ)         range (min … max)', flush=True)
+print('  21.43 ns ±   0.35 ns    21.02 ns …  22.10 ns  in 10 ×  4665 runs', flush=True)
+time.sleep({sleep})
+'''
+
+
+def fake_moon(tmp_path, monkeypatch, sleep):
+    moon = tmp_path / 'moon'
+    moon.write_text(FAKE_MOON.format(python=sys.executable, sleep=sleep), encoding='utf-8')
+    moon.chmod(0o755)
+    monkeypatch.setattr(bench, 'find_moon', lambda env=None: str(moon))
+    monkeypatch.setattr(bench, 'state_path', lambda *parts: tmp_path.joinpath(*parts))
+    (tmp_path / 'bench').mkdir()
+    monkeypatch.setattr(bench, '_git_rev', lambda: '')
+
+
+def test_timeout_is_enforced_and_recorded(tmp_path, monkeypatch):
+    fake_moon(tmp_path, monkeypatch, sleep=20)
+    start = time.monotonic()
+    run_data = bench.run(['wasm-gc'], timeout=1)
+    assert time.monotonic() - start < 10
+    assert run_data['errors']['wasm-gc']['exit_code'] is None
+    assert run_data['targets']['wasm-gc'] == {}
+
+
+def test_results_parsed_from_stream(tmp_path, monkeypatch):
+    fake_moon(tmp_path, monkeypatch, sleep=0)
+    results, code, _ = bench.run_target('wasm-gc', timeout=10)
+    assert code == 0
+    assert results['x_bench_test.mbt::fast']['runs'] == 46650
@@ -0,0 +1,70 @@
+import asyncio
+import gzip
+import json
+
+from harness import __main__ as cli
+from harness import collector
+
+
+async def exchange(request):
+    server_side = collector.Collector()
+    server = await asyncio.start_server(server_side.handle_connection, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(request)
+        await writer.drain()
+        reply = await reader.read()
+        writer.close()
+    return reply, server_side.stats
+
+
+def post(body, headers='Content-Type: application/json\r\n'):
+    return (f'POST /v1/traces HTTP/1.1\r\n{headers}Content-Length: {len(body)}\r\n'
+            'Connection: close\r\n\r\n').encode() + body
+
+
+def test_malformed_content_length_is_400():
+    reply, stats = asyncio.run(exchange(b'POST /v1/traces HTTP/1.1\r\nContent-Length: abc\r\n\r\n'))
+    assert reply.startswith(b'HTTP/1.1 400 ')
+    assert stats.statuses == {'400': 1}
+
+
+def test_oversized_body_is_413():
+    request = f'POST /v1/traces HTTP/1.1\r\nContent-Length: {collector.MAX_BODY + 1}\r\n\r\n'
+    reply, _ = asyncio.run(exchange(request.encode()))
+    assert reply.startswith(b'HTTP/1.1 413 ')
+
+
+def test_json_body_that_is_not_an_object_is_400():
+    for body in (b'[1, 2]', b'{"resourceSpans": [3]}', b'{"resourceSpans": [{"scopeSpans": [{"spans": [1]}]}]}'):
+        reply, stats = asyncio.run(exchange(post(body)))
+        assert reply.startswith(b'HTTP/1.1 400 '), body
+        assert stats.decode_errors == 1
+
+
+def test_json_body_is_counted():
+    span = {'traceId': '0' * 32, 'spanId': '0' * 16}
+    body = json.dumps({'resourceSpans': [{'scopeSpans': [{'spans': [span, {}]}]}]}).encode()
+    reply, stats = asyncio.run(exchange(post(body)))
+    assert reply.startswith(b'HTTP/1.1 200 ')
+    assert (stats.batches, stats.spans, stats.invalid_spans) == (1, 2, 1)
+
+
+def test_stats_printed_on_interrupt(monkeypatch, capsys):
+    def interrupted(coro):
+        coro.close()
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(cli.asyncio, 'run', interrupted)
+    assert cli.main(['collector']) == 0
+    assert json.loads(capsys.readouterr().out)['requests'] == 0
+
+
+def test_corrupt_gzip_body_is_400():
+    body = bytearray(gzip.compress(b'{"resourceSpans": []}'))
+    body[12] ^= 0xFF
+    reply, stats = asyncio.run(exchange(post(bytes(body), 'Content-Type: application/json\r\n'
+                                                          'Content-Encoding: gzip\r\n')))
+    assert reply.startswith(b'HTTP/1.1 400 ')
+    assert stats.decode_errors == 1
@@ -0,0 +1,26 @@
+from harness import matrix, selection
+from harness.packages import Package
+
+
+def test_fingerprint_covers_build_config(tmp_path, monkeypatch):
+    root = tmp_path
+    (root / '.harness').mkdir()
+    pkg_dir = root / 'clock'
+    pkg_dir.mkdir()
+    (root / 'moon.mod.json').write_text('{"name": "m"}')
+    (pkg_dir / 'moon.pkg.json').write_text('{}')
+    (pkg_dir / 'clock.mbt').write_text('pub fn f() -> Int { 1 }\n')
+    (pkg_dir / 'clock_stub.c').write_text('int x;\n')
+    for module in (matrix, selection):
+        monkeypatch.setattr(module, 'REPO_ROOT', root)
+    monkeypatch.setattr(selection, 'state_path', lambda *parts: tmp_path.joinpath('.harness', *parts))
+    packages = [Package('m/clock', 'clock', pkg_dir, [])]
+
+    seen = {matrix.tree_fingerprint(packages)}
+    for path, text in ((pkg_dir / 'clock_stub.c', 'int y;\n'),
+                       (pkg_dir / 'moon.pkg.json', '{"native-stub": ["clock_stub.c"]}'),
+                       (root / 'moon.mod.json', '{"name": "m", "version": "1"}')):
+        path.write_text(text)
+        fingerprint = matrix.tree_fingerprint(packages)
+        assert fingerprint not in seen, path.name
+        seen.add(fingerprint)
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import sys
+import time
+
+from harness import pipeline
+from harness.pipeline import LINE_LIMIT, Step, run_step
+
+LONG_LINE = f'''
+import sys
+import time
+sys.stdout.write('é' * {LINE_LIMIT * 2} + '\\n')
+print('test pkg/a_test.mbt::first ok')
+sys.stdout.write('no newline at the end')
+'''
+
+
+def test_line_longer_than_the_limit_does_not_abort_the_step(tmp_path):
+    log_path = tmp_path / 'step.log'
+    step = Step('long', [sys.executable, '-c', LONG_LINE], timeout=30, cwd=tmp_path,
+                log_path=log_path, parse=True)
+    result = asyncio.run(run_step(step))
+    assert result.exit_code == 0
+    assert [r.key for r in result.parser.results] == ['a_test.mbt::first']
+    assert len(result.tail[0]) == LINE_LIMIT
+    assert result.tail[-1] == 'no newline at the end'
+    log = log_path.read_text(encoding='utf-8')
+    assert log.startswith('é' * (LINE_LIMIT * 2) + '\n')
+    assert '\ufffd' not in log
+
+
+# Starts a child that writes a marker file if it outlives the timeout
+SPAWNS_CHILD = '''
+import subprocess, sys, time
+subprocess.Popen([sys.executable, '-c',
+                  'import sys, time; time.sleep(3); open(sys.argv[1], "w").close()', sys.argv[1]])
+time.sleep(30)
+'''
+
+
+def test_timeout_kills_the_whole_process_group(tmp_path):
+    marker = tmp_path / 'child-survived'
+    step = Step('slow', [sys.executable, '-c', SPAWNS_CHILD, str(marker)], timeout=1, cwd=tmp_path,
+                log_path=tmp_path / 'step.log')
+    start = time.monotonic()
+    result = asyncio.run(run_step(step))
+    assert time.monotonic() - start < 10
+    assert result.timed_out
+    time.sleep(3)
+    assert not marker.exists()
+
+
+def test_shell_step_timeout(tmp_path):
+    step = Step('shell', 'sleep 30 | cat', timeout=1, cwd=tmp_path, log_path=tmp_path / 'step.log')
+    start = time.monotonic()
+    result = asyncio.run(run_step(step))
+    assert time.monotonic() - start < 10
+    assert result.timed_out
+
+
+FAKE_MOON = '''#!/bin/sh
+if [ "$1" = --version ]; then echo "moon 0.0.0"; exit 0; fi
+echo "test pkg/a_test.mbt::first ok"
+echo "Total tests: 1, passed: 1, failed: 0."
+'''
+
+
+def test_run_task_without_guard(tmp_path, monkeypatch):
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    moon = bin_dir / 'moon'
+    moon.write_text(FAKE_MOON)
+    moon.chmod(0o755)
+    env = dict(os.environ, PATH=f'{bin_dir}{os.pathsep}{os.environ.get("PATH", "")}')
+    monkeypatch.setattr(pipeline, 'setup_environment', lambda: env)
+    outcome = asyncio.run(pipeline.run_task(tmp_path, test_log=tmp_path / 'test.log',
+                                            guard=False))
+    assert outcome.version == 'moon 0.0.0'
+    assert outcome.decision.branch == 'B'
+    assert outcome.test.parser.summary.passed == 1
+    assert outcome.guard is None
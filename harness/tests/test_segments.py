@@ -0,0 +1,42 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from harness import segments
+from harness.__main__ import main
+from harness.stream import run_streaming
+from harness.toolchain import REPO_ROOT, find_moon, setup_environment
+
+# Where exporter/file/file_segment_sink_test.mbt leaves its segments
+SEGMENT_DIR = Path('/tmp/moonotel-file-sink-test')
+
+
+@pytest.fixture(scope='module')
+def written_segments():
+    env = setup_environment()
+    moon = find_moon(env)
+    if moon is None:
+        pytest.skip('moon is not installed')
+    shutil.rmtree(SEGMENT_DIR, ignore_errors=True)
+    outcome = run_streaming([moon, 'test', '--target', 'native', '-p', 'yourname/otel/exporter/file',
+                             '-f', 'file_segment_sink_test.mbt'], cwd=REPO_ROOT, env=env, timeout=600)
+    assert not outcome.failed, outcome.parser.failures or outcome.parser.build_errors
+    return sorted(SEGMENT_DIR.glob('*.otlp'))
+
+
+def test_segments_read_back(written_segments, capsys):
+    assert [p.name for p in written_segments] == [
+        'every-00000001.otlp', 'interval-00000001.otlp', 'never-00000001.otlp',
+        'oversized-00000001.otlp', 'rotate-00000001.otlp', 'rotate-00000002.otlp',
+    ]
+    assert main(['segments', *map(str, written_segments)]) == 0
+    assert capsys.readouterr().out.splitlines()[-1].startswith('total: 13 records, 14 spans')
+
+
+def test_segments_are_truncated_to_their_records(written_segments):
+    for path in written_segments:
+        summary = segments.read_segment(path)
+        expected = segments.HEADER_LEN + 4 * summary['records'] + summary['bytes']
+        assert os.path.getsize(path) == expected, path.name
@@ -0,0 +1,29 @@
+import sys
+import time
+
+from harness.stream import run_streaming
+
+# Stands in for moon: starts a child that inherits stdout, then waits for it
+SPAWNS_CHILD = '''
+import subprocess, sys, time
+subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+print('test pkg/a_test.mbt::first ok', flush=True)
+time.sleep(30)
+'''
+
+
+def test_timeout_kills_children_holding_the_pipe():
+    start = time.monotonic()
+    outcome = run_streaming([sys.executable, '-c', SPAWNS_CHILD], timeout=1)
+    assert time.monotonic() - start < 10
+    assert outcome.timed_out
+    assert [r.key for r in outcome.parser.results] == ['a_test.mbt::first']
+
+
+def test_exit_code_and_lines():
+    lines = []
+    outcome = run_streaming([sys.executable, '-c', 'print("one"); print("two"); raise SystemExit(3)'],
+                            timeout=10, on_line=lines.append)
+    assert not outcome.timed_out
+    assert outcome.exit_code == 3
+    assert lines == ['one\n', 'two\n']
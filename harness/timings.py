@@ -0,0 +1,102 @@
+"""Per-test and per-file timing history.
+
+Every runner report is appended to `.harness/timings.json` (the most recent
+`MAX_RUNS` runs are kept). File durations are the wall time of each
+`moon test -f` invocation. Test durations come from the stream: each record is
+stamped with the time since the previous record, so they are only as fine as
+what moon prints (run with `--verbose` to get a record for passing tests too).
+
+The history drives shard balancing: a file weighs its median recorded
+duration; files never timed weigh the median of the files that were.
+"""
+import json
+import statistics
+import time
+
+from .toolchain import state_path
+
+MAX_RUNS = 20
+
+
+class History:
+    def __init__(self, path=None):
+        self.path = path or state_path('timings.json')
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.runs = json.load(f).get('runs', [])
+        except (OSError, ValueError):
+            self.runs = []
+
+    def record(self, report):
+        files, tests = {}, {}
+        for result in report['results']:
+            if result['status'] == 'timeout':
+                continue
+            files[result['file']] = result['seconds']
+            for test in result.get('tests', []):
+                tests[f"{result['file']}::{test['name']}"] = test['seconds']
+        if not files:
+            return
+        self.runs.append({'time': time.time(), 'files': files, 'tests': tests})
+        self.runs = self.runs[-MAX_RUNS:]
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'runs': self.runs}, f)
+        tmp.replace(self.path)
+
+    def series(self, kind, key):
+        """Recorded durations for one file or test, oldest first."""
+        return [run[kind][key] for run in self.runs if key in run.get(kind, {})]
+
+    def keys(self, kind):
+        seen = set()
+        for run in self.runs:
+            seen.update(run.get(kind, {}))
+        return seen
+
+    def weight_function(self, test_files):
+        """Shard weight per TestFile; falls back to file size with no history."""
+        medians = {}
+        for tf in test_files:
+            values = self.series('files', tf.key)
+            if values:
+                medians[tf.key] = statistics.median(values)
+        if not medians:
+            return None
+        default = statistics.median(medians.values())
+        return lambda tf: medians.get(tf.key, default)
+
+    def slowest(self, kind='tests', n=10, window=5):
+        """Rows (key, last seconds, trend over the last `window` runs) for the n slowest."""
+        rows = []
+        for key in self.keys(kind):
+            values = self.series(kind, key)
+            if not values:
+                continue
+            recent = values[-window:]
+            rows.append((key, values[-1], recent))
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return rows[:n]
+
+
+def trend(recent):
+    """Relative change of the latest value against the mean of the earlier ones."""
+    if len(recent) < 2:
+        return None
+    earlier = statistics.mean(recent[:-1])
+    if earlier <= 0:
+        return None
+    return recent[-1] / earlier - 1
+
+
+def print_slowest(history, kind='tests', n=10, window=5):
+    rows = history.slowest(kind, n, window)
+    if not rows:
+        print(f'No {kind} timings recorded yet; run `python3 -m harness test` first.')
+        return
+    print(f"{kind[:-1]:<72} {'last':>8} {'trend':>8}  recent")
+    for key, last, recent in rows:
+        change = trend(recent)
+        change = '-' if change is None else f'{change * 100:+.0f}%'
+        recent_str = ' '.join(f'{v:.2f}' for v in recent)
+        print(f'{key:<72} {last:>7.2f}s {change:>8}  {recent_str}')
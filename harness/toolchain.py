@@ -0,0 +1,32 @@
+"""Locate the moon toolchain and build the environment it runs in."""
+import os
+import shutil
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+MOON_BIN = Path.home() / '.moon' / 'bin'
+STATE_DIR = REPO_ROOT / '.harness'
+
+
+def setup_environment():
+    """Return a copy of os.environ with moon on PATH and pagers disabled."""
+    env = os.environ.copy()
+    env['PATH'] = str(MOON_BIN) + os.pathsep + env.get('PATH', '')
+    env['PAGER'] = 'cat'
+    env['GIT_PAGER'] = 'cat'
+    env['LESS'] = ''
+    env['MORE'] = ''
+    return env
+
+
+def find_moon(env=None):
+    """Return the path to the moon executable, or None if it is not installed."""
+    env = env or setup_environment()
+    return shutil.which('moon', path=env.get('PATH'))
+
+
+def state_path(*parts):
+    """Path under the harness state directory, creating parent directories."""
+    path = STATE_DIR.joinpath(*parts)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
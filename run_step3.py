@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 import os
-import subprocess
 import sys
 
+from harness import pipeline
+from harness.stream import run_streaming
+
 # 切换到项目目录
 os.chdir('/home/engine/project')
 
@@ -12,66 +14,44 @@ os.environ['PATH'] = os.path.expanduser('~/.moon/bin') + ':' + os.environ.get('P
 print("=== 第一步：Git pull（已完成）===\n")
 
 print("=== 第二步：配置 moonbit 环境 ===")
-# 检查 moon
-try:
-    result = subprocess.run(
-        ['moon', '--version'],
-        capture_output=True,
-        text=True,
-        timeout=30,
-        env=os.environ
-    )
-    print(f"Moon 版本: {result.stdout}")
-except FileNotFoundError:
-    print("安装 Moon...")
-    subprocess.run(
-        'curl -fsSL https://cli.moonbitlang.com/install/unix.sh | bash',
-        shell=True,
-        capture_output=True,
-        text=True,
-        timeout=60
-    )
+moon = pipeline.run(pipeline.ensure_moon())
+if moon is None:
+    print("Moon 安装失败")
+    sys.exit(2)
+print(f"Moon: {moon}")
 
 print("\n=== 第三步：执行 moon test ===")
-result = subprocess.run(
-    ['moon', 'test'],
-    capture_output=True,
-    text=True,
-    timeout=180,
-    env=os.environ
-)
 
-output = result.stdout + result.stderr
 
-# 保存输出
-with open('/tmp/moon_test_output.txt', 'w', encoding='utf-8') as f:
-    f.write(f"Exit code: {result.returncode}\n\n")
-    f.write(output)
+def report_failure(r):
+    # 失败用例一出现就打印，不必等整个测试结束
+    if r.status != 'ok':
+        print(f"✗ [{r.status}] {r.key}: {r.message}", flush=True)
 
-# 显示输出（限制行数以避免过长的输出）
-lines = output.split('\n')
-if len(lines) > 200:
-    print(f"（输出共 {len(lines)} 行，显示前200行）")
-    for line in lines[:200]:
-        print(line)
-    print(f"\n...（剩余 {len(lines)-200} 行未显示）...")
-else:
-    print(output)
 
-print(f"\n测试退出码: {result.returncode}")
+with open('/tmp/moon_test_output.txt', 'w', encoding='utf-8') as f:
+    outcome = run_streaming([moon, 'test'], env=os.environ, log_file=f,
+                            timeout=180, on_result=report_failure)
+
+parser = outcome.parser
+if parser.summary:
+    print(f"Total tests: {parser.summary.total}, passed: {parser.summary.passed}, "
+          f"failed: {parser.summary.failed}.")
+print(f"\n测试退出码: {'超时' if outcome.timed_out else outcome.exit_code}")
 
 # 第四步：分析结果
 print("\n=== 第四步：分析结果 ===")
-has_error = any(word in output.lower() for word in ['error', 'fatal', 'panic'])
 
-if has_error or result.returncode != 0:
+if outcome.failed:
     print("=" * 60)
     print("分支A: 测试失败")
     print("=" * 60)
-    if has_error:
-        print("✗ 输出中包含 error/fatal/panic 关键词")
-    if result.returncode != 0:
-        print(f"✗ 测试返回非零退出码: {result.returncode}")
+    for failure in parser.failures:
+        print(f"✗ {failure.status}: {failure.key}")
+    for line in parser.build_errors:
+        print(f"✗ 编译错误: {line}")
+    if outcome.exit_code != 0:
+        print(f"✗ 测试返回非零退出码: {outcome.exit_code}")
     print("\n需要执行:")
     print("1. 检查并消除代码中的死循环")
     print("2. 修复导致失败的问题（只修改业务代码）")
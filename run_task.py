@@ -1,64 +1,33 @@
 #!/usr/bin/env python3
-import subprocess
-import os
+import shutil
 import sys
-import time
 
-# 设置 PATH 环境变量
-os.environ['PATH'] = os.path.expanduser('~/.moon/bin:') + os.environ.get('PATH', '')
-
-def run_command(cmd, cwd='/home/engine/project'):
-    """运行命令并返回输出"""
-    result = subprocess.run(
-        cmd,
-        shell=True,
-        cwd=cwd,
-        capture_output=True,
-        text=True
-    )
-    return result.stdout, result.stderr, result.returncode
+from harness import pipeline
 
 print("=== STEP 1: Git pull (already done) ===")
 print("Git pull was completed earlier")
 
 print("\n=== STEP 2: Configure moonbit environment ===")
-
-# 检查 moon 是否存在
-stdout, stderr, code = run_command('which moon')
-if code != 0 or not stdout.strip():
-    print("Moon not found, installing...")
-    stdout, stderr, code = run_command('curl -fsSL https://cli.moonbitlang.com/install/unix.sh | bash')
-    print(stdout)
-    print(stderr)
-else:
-    print(f"Moon found at: {stdout.strip()}")
-
-# 检查 moon 版本
-stdout, stderr, code = run_command('moon --version')
-print(f"Moon version: {stdout.strip()}")
-if stderr:
-    print(f"Stderr: {stderr}")
-
 print("\n=== STEP 3: Run moon test ===")
-stdout, stderr, code = run_command('moon test')
-print("Moon test output:")
-print(stdout)
-if stderr:
-    print("Stderr:")
-    print(stderr)
+outcome = pipeline.run(pipeline.run_task('/home/engine/project', guard=False))
+if outcome is None:
+    print("Moon installation failed")
+    sys.exit(2)
+print(f"Moon found at: {outcome.moon}")
+print(f"Moon version: {outcome.version}")
 
-# 保存完整输出
-full_output = stdout + stderr
+print("Moon test output:")
+with open(outcome.test.log_path, encoding='utf-8') as f:
+    shutil.copyfileobj(f, sys.stdout)
 
 # 检查测试结果
 print("\n=== STEP 4: Analyze test results ===")
+decision = outcome.decision
 
-has_error_keywords = any(word in full_output.lower() for word in ['error', 'fatal', 'panic'])
-test_failed = code != 0 or has_error_keywords
-
-if test_failed:
+if decision.failed:
     print("=== BRANCH A: Tests FAILED ===")
-    print("Found error/fatal/panic in output or test returned non-zero exit code")
+    for reason in decision.reasons:
+        print(f"  {reason}")
     print("Need to:")
     print("1. Check and remove dead loops in code")
     print("2. Fix the issues (modify business code, not test code unless compilation errors)")
@@ -1,81 +1,251 @@
 #!/usr/bin/env python3
+"""Scan the tree for garbled bytes and mangled separators, fixing what is safe.
+
+One compiled pattern is run over each file's memory-mapped bytes, files are
+scanned in a thread pool, and files whose size and mtime match the on-disk
+cache from the previous run are not opened at all. A file is only rewritten
+when cleaning actually changes its bytes.
+
+Fixes applied:
+    control characters (except tab/newline/carriage return) are removed
+    runs of three or more slashes are collapsed to '//'
+
+Runs of backslashes are never collapsed: that would break escape sequences
+in string literals (the previous implementation raised on that substitution
+and skipped such files).
+
+With --report nothing is written (not even the cache): each finding is listed
+with its file, byte offset and pattern, as text, JSON or a unified diff, and
+the exit status is 1 when any file would be rewritten, so it can gate CI.
+"""
+import argparse
+import difflib
+import json
+import mmap
 import os
 import re
+import shutil
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-PATTERNS = [
-    r'[^\x20-\x7E]{5,}',
-    r'[\x00-\x08\x0B-\x0C\x0E-\x1F\x7F]',
-    r'\\',
-    r'//',
-]
+SKIP_DIRS = {'.git', '_build', '.harness', 'node_modules', '__pycache__'}
+SKIP_EXTS = {'.git', '.png', '.jpg', '.jpeg', '.wasm', '.core', '.map'}
+MAX_SIZE = 1024 * 1024
+CACHE_VERSION = 1
+
+# Only bytes the guard is allowed to change; a file without a match is clean
+FIXABLE = re.compile(rb'(?P<control>[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]+)|(?P<slashes>/{3,})')
+
+
+def _fix_match(match):
+    return b'' if match.lastgroup == 'control' else b'//'
+
+
+def clean_bytes(data):
+    return FIXABLE.sub(_fix_match, data)
+
+
+def iter_candidates(project_root):
+    """Yield (path, stat) for every file the guard should consider."""
+    stack = [str(project_root)]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = list(os.scandir(current))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in SKIP_DIRS:
+                    stack.append(entry.path)
+                continue
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            if os.path.splitext(entry.name)[1] in SKIP_EXTS:
+                continue
+            st = entry.stat(follow_symlinks=False)
+            if st.st_size > MAX_SIZE:
+                continue
+            yield Path(entry.path), st
+
+
+def read_if_fixable(filepath, size):
+    """Return the file bytes when FIXABLE matches, else None."""
+    if size == 0:
+        return None
+    with open(filepath, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if FIXABLE.search(mm) is None:
+                return None
+            return mm[:]
+
 
-def has_issues(content):
-    for pattern in PATTERNS:
-        if re.search(pattern, content):
-            return True
-    return False
+def find_issues(filepath, size, limit=1000):
+    """Return (data, cleaned, findings) for a file that would change, else None.
 
-def clean_file(filepath):
+    Each finding is (byte offset, pattern name, match length); at most `limit`
+    are collected per file.
+    """
+    data = read_if_fixable(filepath, size)
+    if data is None:
+        return None
+    cleaned = clean_bytes(data)
+    if cleaned == data:
+        return None
+    findings = []
+    for match in FIXABLE.finditer(data):
+        findings.append((match.start(), match.lastgroup, match.end() - match.start()))
+        if len(findings) >= limit:
+            break
+    return data, cleaned, findings
+
+
+def unified_diff(rel, before, after):
+    a = before.decode('utf-8', 'surrogateescape').splitlines(keepends=True)
+    b = after.decode('utf-8', 'surrogateescape').splitlines(keepends=True)
+    return ''.join(difflib.unified_diff(a, b, fromfile=f'a/{rel}', tofile=f'b/{rel}'))
+
+
+def write_atomic(filepath, data):
+    fd, tmp = tempfile.mkstemp(dir=filepath.parent, prefix='.guard-')
     try:
-        with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
-            content = f.read()
-        
-        if not has_issues(content):
-            return False
-        
-        content = re.sub(r'[\x00-\x08\x0B-\x0C\x0E-\x1F\x7F]', '', content)
-        content = re.sub(r'\\+', '\\', content)
-        content = re.sub(r'//+', '//', content)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
-        return True
-    except:
-        return False
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        shutil.copymode(filepath, tmp)
+        os.replace(tmp, filepath)
+    except BaseException:
+        os.unlink(tmp)
+        raise
 
-def should_check(filepath):
-    skip = {'.git', '_build', 'node_modules', '__pycache__'}
-    exts = {'.git', '.png', '.jpg', '.jpeg', '.wasm', '.core', '.map'}
-    filepath = Path(filepath)
-    
-    for part in filepath.parts:
-        if part in skip:
-            return False
-    
-    if filepath.suffix in exts:
-        return False
-    
-    if not filepath.is_file():
+
+def clean_file(filepath, size):
+    """Fix one file in place. Returns True if rewritten, None if unreadable."""
+    try:
+        data = read_if_fixable(filepath, size)
+    except (OSError, ValueError):
+        return None
+    if data is None:
         return False
-    
-    if filepath.stat().st_size > 1024 * 1024:
+    cleaned = clean_bytes(data)
+    if cleaned == data:
         return False
-    
+    write_atomic(filepath, cleaned)
     return True
 
-def main():
-    project_root = Path(__file__).parent.parent
-    fixed = 0
-    
+
+def cache_path(project_root):
+    return project_root / '.harness' / 'guard_cache.json'
+
+
+def load_cache(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') == CACHE_VERSION:
+            return data['files']
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def save_cache(path, files):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_VERSION, 'files': files}, f)
+    tmp.replace(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', type=Path, default=Path(__file__).resolve().parent.parent)
+    parser.add_argument('--jobs', type=int, default=min(32, (os.cpu_count() or 1) * 4))
+    parser.add_argument('--no-cache', action='store_true', help='rescan every file')
+    parser.add_argument('--report', action='store_true',
+                        help='list what would change without writing any file; exit 1 if anything would')
+    parser.add_argument('--format', choices=('text', 'json', 'diff'), default='text',
+                        help='output format for --report')
+    args = parser.parse_args(argv)
+
+    project_root = args.root
+    cache_file = cache_path(project_root)
+    cache = {} if args.no_cache else load_cache(cache_file)
+    seen = {}
+    todo = []
+    skipped = 0
+    for filepath, st in iter_candidates(project_root):
+        rel = str(filepath.relative_to(project_root))
+        stamp = [st.st_size, st.st_mtime_ns]
+        seen[rel] = stamp
+        if cache.get(rel) == stamp:
+            skipped += 1
+            continue
+        todo.append((rel, filepath, st.st_size))
+
+    if args.report:
+        return report(todo, skipped, args.format, args.jobs)
+
     print(f"Scanning: {project_root}")
-    
-    for root, dirs, files in os.walk(project_root):
-        dirs[:] = [d for d in dirs if d not in {'.git', '_build', 'node_modules', '__pycache__'}]
-        
-        for filename in files:
-            filepath = Path(root) / filename
-            
-            if not should_check(filepath):
-                continue
-            
-            if clean_file(filepath):
-                print(f"Fixed: {filepath.relative_to(project_root)}")
+    fixed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        outcomes = pool.map(lambda item: clean_file(item[1], item[2]), todo)
+        for (rel, filepath, _), rewritten in zip(todo, outcomes):
+            if rewritten is None:
+                del seen[rel]
+            elif rewritten:
+                print(f"Fixed: {rel}")
                 fixed += 1
-    
+                st = filepath.stat()
+                seen[rel] = [st.st_size, st.st_mtime_ns]
+
+    save_cache(cache_file, seen)
+    print(f"Files scanned: {len(todo)}, unchanged since last run: {skipped}")
     print(f"Files fixed: {fixed}")
     return 0
 
+
+def report(todo, skipped, fmt, jobs):
+    def scan(item):
+        try:
+            return find_issues(item[1], item[2])
+        except (OSError, ValueError):
+            return None
+
+    files = []
+    out = sys.stdout
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        for (rel, _, _), issues in zip(todo, pool.map(scan, todo)):
+            if issues is None:
+                continue
+            before, after, findings = issues
+            files.append({
+                'path': rel,
+                'bytes_before': len(before),
+                'bytes_after': len(after),
+                'findings': [{'offset': o, 'pattern': p, 'length': n} for o, p, n in findings],
+            })
+            if fmt == 'diff':
+                out.buffer.write(unified_diff(rel, before, after).encode('utf-8', 'surrogateescape'))
+            elif fmt == 'text':
+                for offset, pattern, length in findings:
+                    print(f"{rel}:{offset}: {pattern} ({length} bytes)")
+
+    summary = {
+        'files_scanned': len(todo),
+        'files_unchanged_since_last_run': skipped,
+        'files_to_fix': len(files),
+        'findings': sum(len(f['findings']) for f in files),
+    }
+    if fmt == 'json':
+        json.dump({'files': sorted(files, key=lambda f: f['path']), 'summary': summary}, out, indent=2)
+        out.write('\n')
+    else:
+        print(f"Files that would be fixed: {summary['files_to_fix']} "
+              f"({summary['findings']} findings, {summary['files_scanned']} scanned)", file=sys.stderr)
+    return 1 if files else 0
+
+
 if __name__ == '__main__':
     sys.exit(main())